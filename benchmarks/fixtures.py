@@ -0,0 +1,134 @@
+import random
+import typing
+
+import mnllib
+
+from mnlscript import (
+    Sound,
+    TextEntryDefinition,
+    Variables,
+    emit_command,
+    say,
+    subroutine,
+    wait,
+)
+from mnlscript.globals import Globals
+from mnlscript.misc import FEventScriptModule
+
+
+ARITHMETIC_VARIABLE_NUMBERS = range(0x1000, 0x1020)
+UNKNOWN_COMMAND_IDS = [0x0050, 0x0073, 0x00C5, 0x0123, 0x0147, 0x0200]
+# Type checkers take subscripting the metaclass-backed `Variables` for generics.
+SCRIPT_VARIABLES: typing.Any = Variables
+TEXTS = [
+    "Hello there!",
+    "It's dangerous to go alone.",
+    'He said "wait for me".',
+    "Line one\nLine two",
+    "Bros. attack!",
+]
+
+
+class SyntheticCommandParameterMetadata:
+    parameter_types: list[typing.Any]
+
+    def __init__(self, parameter_types: list[typing.Any]) -> None:
+        self.parameter_types = parameter_types
+
+
+class SyntheticFEventScriptManager:
+    fevent_chunks: list[
+        tuple[
+            mnllib.FEventScript | None,
+            mnllib.FEventChunk | None,
+            mnllib.FEventChunk | None,
+        ]
+    ]
+    command_parameter_metadata_table: list[SyntheticCommandParameterMetadata]
+
+    def __init__(self) -> None:
+        self.fevent_chunks = []
+        parameter_type = max(
+            mnllib.COMMAND_PARAMETER_STRUCT_MAP,
+            key=lambda x: mnllib.COMMAND_PARAMETER_STRUCT_MAP[x].size,
+        )
+        self.command_parameter_metadata_table = [
+            SyntheticCommandParameterMetadata([parameter_type] * 16)
+        ] * 0x10000
+
+
+def emit_synthetic_commands(rng: random.Random, commands: int) -> None:
+    for _ in range(commands):
+        kind = rng.random()
+        if kind < 0.3:
+            say(
+                rng.randrange(0x10),
+                rng.choice(list(Sound)),
+                TextEntryDefinition(rng.choice(TEXTS), (rng.randint(1, 4), 1)),
+                wait=rng.random() < 0.8,
+            )
+        elif kind < 0.8:
+            res = rng.choice(ARITHMETIC_VARIABLE_NUMBERS)
+            a = SCRIPT_VARIABLES[rng.choice(ARITHMETIC_VARIABLE_NUMBERS)]
+            b = SCRIPT_VARIABLES[rng.choice(ARITHMETIC_VARIABLE_NUMBERS)]
+            match rng.randrange(4):
+                case 0:
+                    SCRIPT_VARIABLES[res] = a + rng.randrange(0x100)
+                case 1:
+                    SCRIPT_VARIABLES[res] = a * b
+                case 2:
+                    SCRIPT_VARIABLES[res] = rng.randrange(0x10000)
+                case _:
+                    variable = SCRIPT_VARIABLES[res]
+                    variable += rng.choice([1, -1, rng.randrange(2, 0x10)])
+        elif kind < 0.85:
+            wait(rng.randrange(1, 60))
+        else:
+            emit_command(
+                rng.choice(UNKNOWN_COMMAND_IDS),
+                [rng.randrange(0x100) for _ in range(rng.randrange(4))],
+            )
+
+
+def build_synthetic_room(
+    rng: random.Random, room_id: int, subroutines: int, commands: int
+) -> tuple[mnllib.FEventScript, mnllib.LanguageTable | None]:
+    module = FEventScriptModule(f"synthetic_{room_id:04x}")
+    module.script_index = room_id * 3
+    module.subroutines = []
+    module.header = mnllib.FEventScriptHeader()
+
+    token = Globals.current_script.set(module)
+    try:
+        for _ in range(subroutines):
+
+            @subroutine()
+            def synthetic_subroutine(sub: mnllib.Subroutine) -> None:
+                emit_synthetic_commands(rng, commands)
+
+    finally:
+        Globals.current_script.reset(token)
+
+    script = mnllib.FEventScript(module.header, module.subroutines, module.script_index)
+    room_text_tables = Globals.text_tables.pop(room_id, None)
+    if room_text_tables is None:
+        return script, None
+    text_tables: list[mnllib.TextTable | bytes | None] = [None] * (
+        max(room_text_tables) + 1
+    )
+    for text_table_id, text_table in room_text_tables.items():
+        text_tables[text_table_id] = text_table
+    return script, mnllib.LanguageTable(text_tables, room_id)
+
+
+def build_synthetic_manager(
+    rooms: int, subroutines: int, commands: int, seed: int = 0
+) -> mnllib.FEventScriptManager:
+    rng = random.Random(seed)
+    manager = SyntheticFEventScriptManager()
+    for room_id in range(rooms):
+        script, language_table = build_synthetic_room(
+            rng, room_id, subroutines, commands
+        )
+        manager.fevent_chunks.append((script, None, language_table))
+    return typing.cast(mnllib.FEventScriptManager, manager)
@@ -0,0 +1,273 @@
+import argparse
+import collections.abc
+import contextlib
+import io
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import typing
+
+import mnllib
+
+from mnlscript import emit_command, subroutine
+from mnlscript.globals import Globals
+from mnlscript.misc import FEventScriptModule
+from mnlscript.tools.compiler import compile_room
+from mnlscript.tools.consts import FEVENT_SCRIPTS_DIR
+from mnlscript.tools.decompiler import (
+    DecompilerGlobals,
+    ScriptWriter,
+    decompile_room,
+    decompile_script,
+    decompile_subroutine_commands,
+)
+
+from .fixtures import SCRIPT_VARIABLES, build_synthetic_manager
+
+
+DEFAULT_PARAMETERS: dict[str, int] = {
+    "rooms": 20,
+    "subroutines": 8,
+    "commands": 40,
+    "emissions": 20000,
+    "repeat": 5,
+    "seed": 0,
+}
+DEFAULT_THRESHOLD = 0.1
+
+
+Benchmark: typing.TypeAlias = typing.Callable[[], None]
+
+
+def time_benchmark(benchmark: Benchmark, repeat: int) -> list[float]:
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def benchmark_decompile_script(manager: mnllib.FEventScriptManager) -> Benchmark:
+    def benchmark() -> None:
+        DecompilerGlobals.next_text_entry_index.clear()
+        DecompilerGlobals.subroutine_bodies.clear()
+        for room_id, chunk_triple in enumerate(manager.fevent_chunks):
+            decompile_script(
+                manager,
+                typing.cast(mnllib.FEventScript, chunk_triple[0]),
+                chunk_triple,
+                room_id * 3,
+                ScriptWriter(),
+            )
+
+    return benchmark
+
+
+def benchmark_decompile_subroutine_commands(
+    manager: mnllib.FEventScriptManager,
+) -> Benchmark:
+    def benchmark() -> None:
+        DecompilerGlobals.next_text_entry_index.clear()
+        DecompilerGlobals.subroutine_bodies.clear()
+        for room_id, chunk_triple in enumerate(manager.fevent_chunks):
+            script = typing.cast(mnllib.FEventScript, chunk_triple[0])
+            for script_subroutine in script.subroutines:
+                decompile_subroutine_commands(
+                    manager,
+                    script_subroutine,
+                    chunk_triple,
+                    room_id * 3,
+                    ScriptWriter(),
+                    "",
+                )
+
+    return benchmark
+
+
+def benchmark_compile_room(
+    manager: mnllib.FEventScriptManager, scripts_root: pathlib.Path
+) -> Benchmark:
+    DecompilerGlobals.next_text_entry_index.clear()
+    DecompilerGlobals.subroutine_bodies.clear()
+    room_script_paths: dict[int, list[tuple[int, pathlib.Path]]] = {}
+    with contextlib.chdir(scripts_root):
+        FEVENT_SCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
+        for room_id, chunk_triple in enumerate(manager.fevent_chunks):
+            for path, source in decompile_room(manager, room_id, chunk_triple):
+                path.write_text(source)
+                room_script_paths.setdefault(room_id, []).append(
+                    (int(path.stem.partition("_")[2] or 0), path)
+                )
+
+    def benchmark() -> None:
+        with contextlib.chdir(scripts_root), contextlib.redirect_stdout(io.StringIO()):
+            for room_id, script_paths in room_script_paths.items():
+                compile_room(room_id, script_paths)
+
+    return benchmark
+
+
+def emission_context(function: Benchmark) -> Benchmark:
+    def benchmark() -> None:
+        module = FEventScriptModule("benchmark")
+        module.script_index = 0
+        module.subroutines = []
+        module.header = mnllib.FEventScriptHeader()
+        token = Globals.current_script.set(module)
+        try:
+            subroutine()(lambda sub: function())
+        finally:
+            Globals.current_script.reset(token)
+            Globals.text_tables.clear()
+
+    return benchmark
+
+
+def benchmark_emit_command(emissions: int) -> Benchmark:
+    def benchmark() -> None:
+        for _ in range(emissions):
+            emit_command(0x0123, [0x01, 0x02, 0x03])
+
+    return emission_context(benchmark)
+
+
+def benchmark_variable_operators(emissions: int) -> Benchmark:
+    def benchmark() -> None:
+        a = SCRIPT_VARIABLES[0x1000]
+        for i in range(emissions // 2):
+            SCRIPT_VARIABLES[0x1001] = a + i
+            a += 5
+
+    return emission_context(benchmark)
+
+
+def run_benchmarks(parameters: dict[str, int]) -> dict[str, typing.Any]:
+    manager = build_synthetic_manager(
+        parameters["rooms"],
+        parameters["subroutines"],
+        parameters["commands"],
+        parameters["seed"],
+    )
+
+    results: dict[str, dict[str, typing.Any]] = {}
+    with tempfile.TemporaryDirectory() as scripts_root:
+        benchmarks: dict[str, Benchmark] = {
+            "decompile_script": benchmark_decompile_script(manager),
+            "decompile_subroutine_commands": benchmark_decompile_subroutine_commands(
+                manager
+            ),
+            "compile_room": benchmark_compile_room(manager, pathlib.Path(scripts_root)),
+            "emit_command": benchmark_emit_command(parameters["emissions"]),
+            "variable_operators": benchmark_variable_operators(parameters["emissions"]),
+        }
+        for name, benchmark in benchmarks.items():
+            times = time_benchmark(benchmark, parameters["repeat"])
+            results[name] = {
+                "min": min(times),
+                "median": statistics.median(times),
+                "times": times,
+            }
+            print(f"{name}: {min(times) * 1000:.2f} ms", file=sys.stderr)
+
+    return {
+        "parameters": parameters,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def compare_results(
+    baseline: dict[str, typing.Any],
+    current: dict[str, typing.Any],
+    threshold: float,
+) -> list[str]:
+    regressions: list[str] = []
+    for name, current_result in current["results"].items():
+        baseline_result = baseline["results"].get(name)
+        if baseline_result is None:
+            print(f"{name:<32} {"":>12} {current_result["min"] * 1000:>10.2f} ms")
+            continue
+        change = current_result["min"] / baseline_result["min"] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<32} {baseline_result["min"] * 1000:>10.2f} ms "
+            f"{current_result["min"] * 1000:>10.2f} ms {change:>+8.1%}"
+            f"{"  REGRESSION" if regressed else ""}"
+        )
+    return regressions
+
+
+def main(argv: collections.abc.Sequence[str] | None = None) -> None:
+    argp = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark compile and decompile throughput on synthetic rooms.",
+    )
+    subparsers = argp.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "-o",
+        "--output",
+        type=pathlib.Path,
+        help="JSON file to write the results to (default: standard output)",
+    )
+    for name, default in DEFAULT_PARAMETERS.items():
+        run_parser.add_argument(
+            f"--{name}", type=int, default=default, help="(default: %(default)s)"
+        )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="compare results against a saved baseline"
+    )
+    compare_parser.add_argument("baseline", type=pathlib.Path)
+    compare_parser.add_argument(
+        "current",
+        type=pathlib.Path,
+        nargs="?",
+        help="results to compare (default: run the benchmarks with the parameters "
+        "of the baseline)",
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown that counts as a regression (default: %(default)s)",
+    )
+
+    args = argp.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(
+            {name: getattr(args, name) for name in DEFAULT_PARAMETERS}
+        )
+        if args.output is not None:
+            with args.output.open("w") as file:
+                json.dump(results, file, indent=2)
+                file.write("\n")
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        return
+
+    with args.baseline.open() as file:
+        baseline = json.load(file)
+    if args.current is not None:
+        with args.current.open() as file:
+            current = json.load(file)
+    else:
+        current = run_benchmarks(DEFAULT_PARAMETERS | baseline["parameters"])
+    regressions = compare_results(baseline, current, args.threshold)
+    if regressions:
+        print(
+            f"{len(regressions)} regression(s) over {args.threshold:.0%}: "
+            f"{", ".join(regressions)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
@@ -9,7 +9,9 @@ from dynamicscope import DYNAMIC_SCOPE
 import mnllib
 
 from .consts import BubbleType, Self, SelfType, TailType, TextboxColor
+from .globals import Globals
 from .text import LanguageName, TextEntryDefinition, emit_text_entry
+from .utils import caller_local
 
 
 COMMON_ARITHMETIC_COMMANDS = [
@@ -40,7 +42,14 @@ def command_emitter() -> (
         @functools.wraps(function)
         def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
             if kwargs.get("subroutine") is None:
-                kwargs["subroutine"] = typing.cast(mnllib.Subroutine, DYNAMIC_SCOPE.sub)
+                subroutine = caller_local("sub", mnllib.Subroutine)
+                if subroutine is None:
+                    subroutine = Globals.current_subroutine.get()
+                kwargs["subroutine"] = (
+                    subroutine
+                    if subroutine is not None
+                    else typing.cast(mnllib.Subroutine, DYNAMIC_SCOPE.sub)
+                )
             return function(*args, **kwargs)
 
         return wrapper
@@ -56,6 +65,8 @@ def emit_command(
 
     command = mnllib.Command(*args, **kwargs)
     subroutine.commands.append(command)
+    if Globals.command_recorder is not None:
+        Globals.command_recorder(command)
     return command
 
 
@@ -1,14 +1,43 @@
 import collections
+import contextvars
 import typing
 
 import mnllib
 
+if typing.TYPE_CHECKING:
+    from .misc import FEventScriptModule
+
 
 class Globals:
     text_tables: collections.defaultdict[
         int, dict[int, mnllib.TextTable | bytes | None]
     ] = collections.defaultdict(dict)
 
+    # Variable numbers that expressions may clobber for their temporaries.
+    scratch_variables: list[int] = []
+    # Maps the IDs of commands that call a subroutine of the current script to the
+    # index of the argument holding the subroutine's index.
+    subroutine_call_commands: dict[int, int] = {}
+    # Replaces every subroutine index in a script header with the result of the
+    # given function. Unless it is set, deduplicated subroutines are never dropped.
+    map_header_subroutine_indices: (
+        typing.Callable[[mnllib.FEventScriptHeader, typing.Callable[[int], int]], None]
+        | None
+    ) = None
+
     fevent_manager: mnllib.FEventScriptManager = typing.cast(
         mnllib.FEventScriptManager, None
     )
+
+    current_script: contextvars.ContextVar["FEventScriptModule | None"] = (
+        contextvars.ContextVar("current_script", default=None)
+    )
+    current_subroutine: contextvars.ContextVar[mnllib.Subroutine | None] = (
+        contextvars.ContextVar("current_subroutine", default=None)
+    )
+    current_subroutine_function: contextvars.ContextVar[
+        typing.Callable[..., typing.Any] | None
+    ] = contextvars.ContextVar("current_subroutine_function", default=None)
+
+    # Called with every command emitted through `emit_command`.
+    command_recorder: typing.Callable[[mnllib.Command], None] | None = None
@@ -5,6 +5,8 @@ from dynamicscope import DYNAMIC_SCOPE
 import mnllib
 
 from .commands import return_
+from .globals import Globals
+from .utils import caller_local
 
 
 class MnLScriptWarning(UserWarning):
@@ -34,18 +36,36 @@ def subroutine(
     subs: list[mnllib.Subroutine] | None = None,
     hdr: mnllib.FEventScriptHeader | None = None,
 ) -> typing.Callable[[SubroutineCallable], mnllib.Subroutine]:
+    script = Globals.current_script.get()
     if subs is None:
-        subs = typing.cast(list[mnllib.Subroutine], DYNAMIC_SCOPE.subroutines)
+        subs = caller_local("subroutines", list)
+        if subs is None:
+            subs = (
+                script.subroutines
+                if script is not None
+                else typing.cast(list[mnllib.Subroutine], DYNAMIC_SCOPE.subroutines)
+            )
     if hdr is None:
-        hdr = typing.cast(mnllib.FEventScriptHeader, DYNAMIC_SCOPE.header)
+        hdr = caller_local("header", mnllib.FEventScriptHeader)
+        if hdr is None:
+            hdr = (
+                script.header
+                if script is not None
+                else typing.cast(mnllib.FEventScriptHeader, DYNAMIC_SCOPE.header)
+            )
 
     def decorator(function: SubroutineCallable) -> mnllib.Subroutine:
         subroutine = mnllib.Subroutine([], footer)
 
-        function(sub=subroutine)
-
-        if not no_return:
-            return_(subroutine=subroutine)
+        token = Globals.current_subroutine.set(subroutine)
+        function_token = Globals.current_subroutine_function.set(function)
+        try:
+            function(sub=subroutine)
+            if not no_return:
+                return_(subroutine=subroutine)
+        finally:
+            Globals.current_subroutine_function.reset(function_token)
+            Globals.current_subroutine.reset(token)
 
         if post_table:
             hdr.post_table_subroutine = subroutine
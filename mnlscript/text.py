@@ -1,4 +1,5 @@
 import codecs
+import collections.abc
 import types
 import typing
 
@@ -7,7 +8,7 @@ from dynamicscope import DYNAMIC_SCOPE
 import mnllib
 
 from .globals import Globals
-from .utils import fhex
+from .utils import caller_local, fhex
 
 
 LanguageName: typing.TypeAlias = typing.Literal["en", "fr", "de", "it", "es"]
@@ -41,6 +42,63 @@ def keepliteral_errors(error: UnicodeError) -> tuple[str | bytes, int]:
 codecs.register_error(CODEC_ERROR_HANDLER_KEEP_LITERAL, keepliteral_errors)
 
 
+def build_text_encoding_table(encoding: str) -> dict[int, str] | None:
+    characters = sorted(
+        {chr(x) for x in range(0x100)}
+        | {
+            character
+            for x in range(0x100)
+            for character in bytes([x]).decode(encoding, errors="ignore")
+        }
+    )
+    table: dict[int, str] = {}
+    encoded_characters: list[tuple[str, bytes]] = []
+    for character in characters:
+        try:
+            encoded_character = character.encode(encoding)
+        except UnicodeEncodeError:
+            if ord(character) >= 0x100:
+                continue
+            encoded_character = bytes([ord(character)])
+        else:
+            table[ord(character)] = encoded_character.decode("latin-1")
+        encoded_characters.append((character, encoded_character))
+
+    # The table is only equivalent to the codec if the latter is stateless.
+    text = "".join([character for character, _ in encoded_characters])
+    expected_encoding = b"".join([encoded for _, encoded in encoded_characters])
+    if (
+        text.encode(encoding, errors=CODEC_ERROR_HANDLER_KEEP_LITERAL)
+        != expected_encoding
+        or text.translate(table).encode("latin-1") != expected_encoding
+    ):
+        return None
+    return table
+
+
+TEXT_ENCODING_TABLE = build_text_encoding_table(mnllib.MNL_ENCODING)
+
+
+def encode_text(text: str) -> bytes:
+    if TEXT_ENCODING_TABLE is not None:
+        try:
+            return text.translate(TEXT_ENCODING_TABLE).encode("latin-1")
+        except UnicodeEncodeError:
+            # Characters the table does not cover; let the codec handle them.
+            pass
+    return text.encode(mnllib.MNL_ENCODING, errors=CODEC_ERROR_HANDLER_KEEP_LITERAL)
+
+
+def current_room_id() -> int:
+    script_index = caller_local("script_index", int)
+    if script_index is not None:
+        return script_index // 3
+    script = Globals.current_script.get()
+    if script is not None:
+        return script.script_index // 3
+    return typing.cast(int, DYNAMIC_SCOPE.script_index) // 3
+
+
 TT = typing.TypeVar("TT", bytes, None)
 
 
@@ -66,7 +124,7 @@ def emit_text_table(
     **kwargs: typing.Any,
 ) -> mnllib.TextTable | bytes | None:
     if room_id is None:
-        room_id = typing.cast(int, DYNAMIC_SCOPE.script_index) // 3
+        room_id = current_room_id()
 
     if len(args) > 0 and isinstance(args[0], (bytes, types.NoneType)):
         text_table: mnllib.TextTable | bytes | None = args[0]
@@ -81,45 +139,17 @@ class TextEntryDefinition(typing.NamedTuple):
     textbox_size: tuple[int, int]
 
 
-@typing.overload
-def emit_text_entry(
-    text: str, /, textbox_size: tuple[int, int], *, room_id: int | None = None
-) -> int | None: ...
+TextEntry: typing.TypeAlias = (
+    TextEntryDefinition | dict[LanguageName, TextEntryDefinition]
+)
 
 
-@typing.overload
-def emit_text_entry(
-    entry: TextEntryDefinition | dict[LanguageName, TextEntryDefinition],
-    /,
-    *,
-    room_id: int | None = None,
-) -> int | None: ...
-
-
-def emit_text_entry(
-    entry: str | TextEntryDefinition | dict[LanguageName, TextEntryDefinition],
-    /,
-    textbox_size: tuple[int, int] | None = None,
-    *,
-    room_id: int | None = None,
-) -> int | None:
-    if room_id is None:
-        room_id = typing.cast(int, DYNAMIC_SCOPE.script_index) // 3
-
-    if isinstance(entry, str) and textbox_size is None:
-        raise TypeError("textbox_size must not be None if entry is a str")
-
+def get_language_text_tables(
+    room_id: int, function_name: str
+) -> tuple[list[tuple[LanguageName, mnllib.TextTable]], int]:
+    language_text_tables: list[tuple[LanguageName, mnllib.TextTable]] = []
     text_entry_index: int | None = None
     for language_name, language_id in LANGUAGE_IDS.items():
-        if isinstance(entry, dict):
-            current_language_entry = entry.get(language_name, entry[DEFAULT_LANGUAGE])
-        elif isinstance(entry, TextEntryDefinition):
-            current_language_entry = entry
-        else:
-            current_language_entry = TextEntryDefinition(
-                entry, typing.cast(tuple[int, int], textbox_size)
-            )
-
         if language_id not in Globals.text_tables[room_id]:
             Globals.text_tables[room_id][language_id] = mnllib.TextTable(
                 [], is_dialog=True, textbox_sizes=[]
@@ -127,7 +157,7 @@ def emit_text_entry(
         text_table = Globals.text_tables[room_id][language_id]
         if not isinstance(text_table, mnllib.TextTable):
             raise TypeError(
-                f"emit_text_entry() text table for room {fhex(room_id, 4)} with "
+                f"{function_name}() text table for room {fhex(room_id, 4)} with "
                 f"language ID {fhex(language_id, 2)} must be an mnllib.TextTable, "
                 f"not '{type(text_table).__name__}'"
             )
@@ -135,16 +165,93 @@ def emit_text_entry(
             text_entry_index = len(text_table.entries)
         elif len(text_table.entries) != text_entry_index:
             raise ValueError(
-                "all text tables must have the same length for emit_text_entry() but "
-                f"table {fhex(language_id, 2)} has a length of "
+                f"all text tables must have the same length for {function_name}() "
+                f"but table {fhex(language_id, 2)} has a length of "
                 f"{len(text_table.entries)} instead of {text_entry_index}"
             )
-        text_table.entries.append(
-            current_language_entry.text.encode(
-                mnllib.MNL_ENCODING, errors=CODEC_ERROR_HANDLER_KEEP_LITERAL
+        language_text_tables.append((language_name, text_table))
+
+    return language_text_tables, text_entry_index or 0
+
+
+def extend_text_tables(
+    language_text_tables: list[tuple[LanguageName, mnllib.TextTable]],
+    entries: list[TextEntry],
+) -> None:
+    encoded_texts: dict[str, bytes] = {}
+
+    def encode_text_once(text: str) -> bytes:
+        encoded_text = encoded_texts.get(text)
+        if encoded_text is None:
+            encoded_text = encoded_texts[text] = encode_text(text)
+        return encoded_text
+
+    for language_name, text_table in language_text_tables:
+        language_entries = [
+            (
+                entry.get(language_name, entry[DEFAULT_LANGUAGE])
+                if isinstance(entry, dict)
+                else entry
             )
+            for entry in entries
+        ]
+        text_table.entries.extend(
+            [encode_text_once(entry.text) for entry in language_entries]
         )
         if text_table.textbox_sizes is not None:
-            text_table.textbox_sizes.append(current_language_entry.textbox_size)
+            text_table.textbox_sizes.extend(
+                [entry.textbox_size for entry in language_entries]
+            )
+
+
+def emit_text_entries(
+    entries: collections.abc.Iterable[TextEntry], *, room_id: int | None = None
+) -> range:
+    if room_id is None:
+        room_id = current_room_id()
+
+    entries = list(entries)
+    language_text_tables, text_entry_index = get_language_text_tables(
+        room_id, "emit_text_entries"
+    )
+    extend_text_tables(language_text_tables, entries)
+    return range(text_entry_index, text_entry_index + len(entries))
+
+
+@typing.overload
+def emit_text_entry(
+    text: str, /, textbox_size: tuple[int, int], *, room_id: int | None = None
+) -> int | None: ...
 
+
+@typing.overload
+def emit_text_entry(
+    entry: TextEntry,
+    /,
+    *,
+    room_id: int | None = None,
+) -> int | None: ...
+
+
+def emit_text_entry(
+    entry: str | TextEntry,
+    /,
+    textbox_size: tuple[int, int] | None = None,
+    *,
+    room_id: int | None = None,
+) -> int | None:
+    if room_id is None:
+        room_id = current_room_id()
+
+    if isinstance(entry, str):
+        if textbox_size is None:
+            raise TypeError("textbox_size must not be None if entry is a str")
+        entry = TextEntryDefinition(entry, textbox_size)
+
+    language_text_tables, text_entry_index = get_language_text_tables(
+        room_id, "emit_text_entry"
+    )
+    if len(language_text_tables) == 0:
+        return None
+    extend_text_tables(language_text_tables, [entry])
     return text_entry_index
@@ -1,3 +1,11 @@
+import argparse
+import collections
+import collections.abc
+import concurrent.futures
+import hashlib
+import os
+import pathlib
+import pickle
 import sys
 import importlib.abc
 import importlib.machinery
@@ -9,12 +17,63 @@ import mnllib
 from ..consts import PADDING_TEXT_TABLE_ID
 from ..globals import Globals
 from ..misc import FEventInitModule, FEventScriptModule
-from .consts import FEVENT_SCRIPT_FILENAME_REGEX, FEVENT_SCRIPTS_DIR
+from ..utils import fhex
+from .consts import (
+    FEVENT_CACHE_DIR,
+    FEVENT_SCRIPT_FILENAME_REGEX,
+    FEVENT_SCRIPTS_DIR,
+    PROFILE_REPORT_PATH,
+    PROVENANCE_REPORT_PATH,
+    SIZE_REPORT_PATH,
+)
+from .fingerprint import compute_toolchain_fingerprint
+from .optimizer import deduplicate_subroutines, optimize_script
+from .profiling import ProfilingGlobals, enable_profiling, profile_room
+from .provenance import ProvenanceGlobals, enable_provenance
+from .size_report import write_size_report
 
 
-def main() -> None:
-    Globals.fevent_manager = mnllib.FEventScriptManager()
+COMPILE_CACHE_VERSION = 2
+
+
+class TextTableUpdate:
+    text_table: mnllib.TextTable | bytes | None
+    # The number of entries the table had when the room appended to it, or `None`
+    # if the room replaced the table.
+    base_entry_count: int | None
+
+    def __init__(
+        self,
+        text_table: mnllib.TextTable | bytes | None,
+        base_entry_count: int | None,
+    ) -> None:
+        self.text_table = text_table
+        self.base_entry_count = base_entry_count
+
+
+class CompiledRoom:
+    room_id: int
+    scripts: list[tuple[int, mnllib.FEventScript]]
+    text_table_updates: dict[int, dict[int, TextTableUpdate]]
+
+    def __init__(
+        self,
+        room_id: int,
+        scripts: list[tuple[int, mnllib.FEventScript]],
+        text_table_updates: dict[int, dict[int, TextTableUpdate]],
+    ) -> None:
+        self.room_id = room_id
+        self.scripts = scripts
+        self.text_table_updates = text_table_updates
+
+
+class CompilerWorkerGlobals:
+    init_text_tables: collections.defaultdict[
+        int, dict[int, mnllib.TextTable | bytes | None]
+    ] = collections.defaultdict(dict)
 
+
+def load_init_module() -> None:
     init_path = FEVENT_SCRIPTS_DIR / "__init__.py"
     if init_path.is_file():
         init_module_name = ".".join(init_path.parent.parts)
@@ -28,6 +87,11 @@ def main() -> None:
         sys.modules[init_module_name] = init_module
         typing.cast(importlib.abc.Loader, init_spec.loader).exec_module(init_module)
 
+
+def find_room_script_paths() -> dict[int, list[tuple[int, pathlib.Path]]]:
+    room_script_paths: collections.defaultdict[int, list[tuple[int, pathlib.Path]]] = (
+        collections.defaultdict(list)
+    )
     for path in FEVENT_SCRIPTS_DIR.iterdir():
         if not path.is_file():
             continue
@@ -36,61 +100,491 @@ def main() -> None:
             continue
         room_id = int(match.group(1), base=16)
         triple_index = int(match.group(2) or 0)
+        room_script_paths[room_id].append((triple_index, path))
 
-        module_name = ".".join(path.with_suffix("").parts)
-        spec = typing.cast(
-            importlib.machinery.ModuleSpec,
-            importlib.util.spec_from_file_location(module_name, path),
-        )
-        module = typing.cast(FEventScriptModule, importlib.util.module_from_spec(spec))
-        module.script_index = room_id * 3 + triple_index
-        module.subroutines = []
-        sys.modules[module_name] = module
-        typing.cast(importlib.abc.Loader, spec.loader).exec_module(module)
-
-        print(module)
-        script = mnllib.FEventScript(
-            module.header, module.subroutines, module.script_index
+    return {
+        room_id: sorted(room_script_paths[room_id])
+        for room_id in sorted(room_script_paths)
+    }
+
+
+def compile_script(
+    path: pathlib.Path, room_id: int, triple_index: int
+) -> mnllib.FEventScript:
+    module_name = ".".join(path.with_suffix("").parts)
+    spec = typing.cast(
+        importlib.machinery.ModuleSpec,
+        importlib.util.spec_from_file_location(module_name, path),
+    )
+    module = typing.cast(FEventScriptModule, importlib.util.module_from_spec(spec))
+    module.script_index = room_id * 3 + triple_index
+    module.subroutines = []
+    sys.modules[module_name] = module
+    token = Globals.current_script.set(module)
+    try:
+        with profile_room("exec_module", room_id):
+            typing.cast(importlib.abc.Loader, spec.loader).exec_module(module)
+    finally:
+        Globals.current_script.reset(token)
+
+    print(module)
+    return mnllib.FEventScript(module.header, module.subroutines, module.script_index)
+
+
+def slice_text_table(text_table: mnllib.TextTable, start: int) -> mnllib.TextTable:
+    return mnllib.TextTable(
+        text_table.entries[start:],
+        text_table.is_dialog,
+        (
+            text_table.textbox_sizes[start:]
+            if text_table.textbox_sizes is not None
+            else None
+        ),
+    )
+
+
+def copy_text_tables(
+    text_tables: dict[int, dict[int, mnllib.TextTable | bytes | None]],
+) -> collections.defaultdict[int, dict[int, mnllib.TextTable | bytes | None]]:
+    return collections.defaultdict(
+        dict,
+        {
+            room_id: {
+                text_table_id: (
+                    slice_text_table(text_table, 0)
+                    if isinstance(text_table, mnllib.TextTable)
+                    else text_table
+                )
+                for text_table_id, text_table in room_text_tables.items()
+            }
+            for room_id, room_text_tables in text_tables.items()
+        },
+    )
+
+
+def describe_text_table(room_id: int, text_table_id: int) -> str:
+    return f"text table {fhex(text_table_id, 2)} of room {fhex(room_id, 4)}"
+
+
+def compile_room(
+    room_id: int, script_paths: list[tuple[int, pathlib.Path]]
+) -> CompiledRoom:
+    # The scripts extend `Globals.text_tables` in place, so remember what they
+    # started from in order to tell which entries this room added.
+    previous_text_tables = {
+        (text_tables_room_id, text_table_id): (
+            text_table,
+            (
+                len(text_table.entries)
+                if isinstance(text_table, mnllib.TextTable)
+                else None
+            ),
         )
-        chunk_triple = list(Globals.fevent_manager.fevent_chunks[room_id])
+        for text_tables_room_id, room_text_tables in Globals.text_tables.items()
+        for text_table_id, text_table in room_text_tables.items()
+    }
+    scripts = [
+        (triple_index, compile_script(path, room_id, triple_index))
+        for triple_index, path in script_paths
+    ]
+
+    text_table_updates: collections.defaultdict[int, dict[int, TextTableUpdate]] = (
+        collections.defaultdict(dict)
+    )
+    for text_tables_room_id, room_text_tables in Globals.text_tables.items():
+        for text_table_id, text_table in room_text_tables.items():
+            key = (text_tables_room_id, text_table_id)
+            previous_text_table, previous_entry_count = previous_text_tables.get(
+                key, (None, None)
+            )
+            if text_table is previous_text_table and (
+                previous_entry_count is None
+                or len(typing.cast(mnllib.TextTable, text_table).entries)
+                == previous_entry_count
+            ):
+                continue
+            if text_table is previous_text_table:
+                update = TextTableUpdate(
+                    slice_text_table(
+                        typing.cast(mnllib.TextTable, text_table),
+                        typing.cast(int, previous_entry_count),
+                    ),
+                    previous_entry_count,
+                )
+            elif key not in previous_text_tables and isinstance(
+                text_table, mnllib.TextTable
+            ):
+                update = TextTableUpdate(slice_text_table(text_table, 0), 0)
+            else:
+                if previous_entry_count:
+                    raise ValueError(
+                        f"room {fhex(room_id, 4)} replaced "
+                        f"{describe_text_table(text_tables_room_id, text_table_id)}, "
+                        f"dropping {previous_entry_count} entries emitted before it"
+                    )
+                update = TextTableUpdate(text_table, None)
+            text_table_updates[text_tables_room_id][text_table_id] = update
+
+    return CompiledRoom(room_id, scripts, dict(text_table_updates))
+
+
+def merge_text_table_updates(
+    compiled_room: CompiledRoom,
+    text_tables: collections.defaultdict[
+        int, dict[int, mnllib.TextTable | bytes | None]
+    ],
+) -> bool:
+    # Rooms compiled by a worker or taken from the cache started from the text
+    # tables of `__init__.py` alone. Their text entry indices are only valid if
+    # every table they extended still has the length they saw.
+    for text_tables_room_id, updates in compiled_room.text_table_updates.items():
+        for text_table_id, update in updates.items():
+            text_table = text_tables[text_tables_room_id].get(text_table_id)
+            entry_count = (
+                len(text_table.entries)
+                if isinstance(text_table, mnllib.TextTable)
+                else None
+            )
+            if update.base_entry_count is None:
+                if entry_count:
+                    raise ValueError(
+                        f"room {fhex(compiled_room.room_id, 4)} replaced "
+                        f"{describe_text_table(text_tables_room_id, text_table_id)}, "
+                        f"dropping {entry_count} entries emitted before it"
+                    )
+            elif entry_count != update.base_entry_count and not (
+                text_table is None and update.base_entry_count == 0
+            ):
+                return False
+            elif isinstance(text_table, mnllib.TextTable) and not (
+                isinstance(update.text_table, mnllib.TextTable)
+                and update.text_table.is_dialog == text_table.is_dialog
+                and (update.text_table.textbox_sizes is None)
+                == (text_table.textbox_sizes is None)
+            ):
+                raise ValueError(
+                    f"room {fhex(compiled_room.room_id, 4)} emitted conflicting "
+                    "entries into "
+                    f"{describe_text_table(text_tables_room_id, text_table_id)}"
+                )
+
+    for text_tables_room_id, updates in compiled_room.text_table_updates.items():
+        for text_table_id, update in updates.items():
+            text_table = text_tables[text_tables_room_id].get(text_table_id)
+            if update.base_entry_count is None or text_table is None:
+                text_tables[text_tables_room_id][text_table_id] = (
+                    slice_text_table(update.text_table, 0)
+                    if isinstance(update.text_table, mnllib.TextTable)
+                    else update.text_table
+                )
+                continue
+            appended_text_table = typing.cast(mnllib.TextTable, update.text_table)
+            text_table = typing.cast(mnllib.TextTable, text_table)
+            text_table.entries.extend(appended_text_table.entries)
+            if text_table.textbox_sizes is not None:
+                text_table.textbox_sizes.extend(
+                    typing.cast(
+                        list[tuple[int, int]], appended_text_table.textbox_sizes
+                    )
+                )
+    return True
+
+
+def install_compiled_room(compiled_room: CompiledRoom) -> None:
+    room_id = compiled_room.room_id
+    chunk_triple = list(Globals.fevent_manager.fevent_chunks[room_id])
+    for triple_index, script in compiled_room.scripts:
         chunk_triple[triple_index] = script
         if isinstance(chunk_triple[2], mnllib.LanguageTable):
             chunk_triple[2] = None
-        Globals.fevent_manager.fevent_chunks[room_id] = typing.cast(
-            tuple[
-                mnllib.FEventScript | None,
-                mnllib.FEventChunk | None,
-                mnllib.FEventChunk | None,
-            ],
-            tuple(chunk_triple),
+    Globals.fevent_manager.fevent_chunks[room_id] = typing.cast(
+        tuple[
+            mnllib.FEventScript | None,
+            mnllib.FEventChunk | None,
+            mnllib.FEventChunk | None,
+        ],
+        tuple(chunk_triple),
+    )
+
+
+def finalize_language_table(
+    room_id: int, language_table_dict: dict[int, mnllib.TextTable | bytes | None]
+) -> None:
+    language_table = Globals.fevent_manager.fevent_chunks[room_id][2]
+    if language_table is None:
+        language_table = mnllib.LanguageTable([], room_id)
+        Globals.fevent_manager.fevent_chunks[room_id] = (
+            Globals.fevent_manager.fevent_chunks[room_id][:2] + (language_table,)
         )
+    elif not isinstance(language_table, mnllib.LanguageTable):
+        return
 
-    for room_id, language_table_dict in Globals.text_tables.items():
-        language_table = Globals.fevent_manager.fevent_chunks[room_id][2]
-        if language_table is None:
-            language_table = mnllib.LanguageTable([], room_id)
-            Globals.fevent_manager.fevent_chunks[room_id] = (
-                Globals.fevent_manager.fevent_chunks[room_id][:2] + (language_table,)
-            )
-        elif not isinstance(language_table, mnllib.LanguageTable):
+    for text_table_id, text_table in language_table_dict.items():
+        language_table.text_tables.extend(
+            [None] * (text_table_id - len(language_table.text_tables) + 1)
+        )
+        language_table.text_tables[text_table_id] = text_table
+
+    # Serialize every text table only once; both measuring the padding below
+    # and saving the language table then merely concatenate the bytes.
+    language_table.text_tables = [
+        (
+            text_table.to_bytes()
+            if isinstance(text_table, mnllib.TextTable)
+            else text_table
+        )
+        for text_table in language_table.text_tables
+    ]
+
+    if len(language_table.text_tables) <= PADDING_TEXT_TABLE_ID:
+        language_table.text_tables.extend(
+            [None] * (PADDING_TEXT_TABLE_ID - len(language_table.text_tables))
+        )
+        language_table.text_tables.append(b"")
+        language_table_size = len(language_table.to_bytes(Globals.fevent_manager))
+        language_table.text_tables[PADDING_TEXT_TABLE_ID] = b"\x00" * (
+            (-(language_table_size + 1) % mnllib.FEVENT_LANGUAGE_TABLE_ALIGNMENT) + 1
+        )
+
+
+def compute_shared_sources_hash() -> bytes:
+    sources_hash = hashlib.sha256(COMPILE_CACHE_VERSION.to_bytes(4, "little"))
+    sources_hash.update(compute_toolchain_fingerprint().encode())
+    for path in sorted(FEVENT_SCRIPTS_DIR.glob("*.py")):
+        if FEVENT_SCRIPT_FILENAME_REGEX.fullmatch(path.name) is not None:
             continue
+        sources_hash.update(path.name.encode())
+        sources_hash.update(hashlib.sha256(path.read_bytes()).digest())
+    return sources_hash.digest()
+
+
+def compute_room_cache_key(
+    shared_sources_hash: bytes, script_paths: list[tuple[int, pathlib.Path]]
+) -> bytes:
+    room_hash = hashlib.sha256(shared_sources_hash)
+    for triple_index, path in script_paths:
+        room_hash.update(triple_index.to_bytes(4, "little"))
+        room_hash.update(hashlib.sha256(path.read_bytes()).digest())
+    return room_hash.digest()
+
+
+def load_cached_room(room_id: int, cache_key: bytes) -> CompiledRoom | None:
+    try:
+        with (FEVENT_CACHE_DIR / f"{room_id:04x}.pickle").open("rb") as file:
+            cached_key, compiled_room = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if cached_key != cache_key or not isinstance(compiled_room, CompiledRoom):
+        return None
+    return compiled_room
+
+
+def store_cached_room(compiled_room: CompiledRoom, cache_key: bytes) -> None:
+    FEVENT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = FEVENT_CACHE_DIR / f"{compiled_room.room_id:04x}.pickle"
+    temp_path = path.with_suffix(".tmp")
+    with temp_path.open("wb") as file:
+        pickle.dump((cache_key, compiled_room), file, pickle.HIGHEST_PROTOCOL)
+    temp_path.replace(path)
+
+
+def _init_compile_worker(profile: bool, provenance: bool) -> None:
+    Globals.fevent_manager = mnllib.FEventScriptManager()
+    if profile:
+        enable_profiling()
+    if provenance:
+        enable_provenance()
+    load_init_module()
+    CompilerWorkerGlobals.init_text_tables = copy_text_tables(Globals.text_tables)
 
-        for text_table_id, text_table in language_table_dict.items():
-            language_table.text_tables.extend(
-                [None] * (text_table_id - len(language_table.text_tables) + 1)
+
+def _compile_room_in_worker(
+    room_script_paths: tuple[int, list[tuple[int, pathlib.Path]]],
+) -> tuple[CompiledRoom, dict[str, typing.Any] | None, dict[str, typing.Any] | None]:
+    Globals.text_tables = copy_text_tables(CompilerWorkerGlobals.init_text_tables)
+    compiled_room = compile_room(*room_script_paths)
+    profiler = ProfilingGlobals.profiler
+    recorder = ProvenanceGlobals.recorder
+    return (
+        compiled_room,
+        profiler.take() if profiler is not None else None,
+        recorder.take() if recorder is not None else None,
+    )
+
+
+def main(argv: collections.abc.Sequence[str] | None = None) -> None:
+    argp = argparse.ArgumentParser(
+        description="Compile the Python scripts into the FEvent files of the ROM."
+    )
+    argp.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes to compile rooms in "
+        "(0 for one per CPU; default: %(default)s)",
+    )
+    argp.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help=f"neither use nor update the build cache in '{FEVENT_CACHE_DIR}'",
+    )
+    argp.add_argument(
+        "-O",
+        "--optimize",
+        action="store_true",
+        help="fold constants, merge consecutive additions and drop dead stores as "
+        "well as unreachable commands in subroutines without branches",
+    )
+    argp.add_argument(
+        "--deduplicate-subroutines",
+        action="store_true",
+        help="point calls to identical subroutines of a script at the first copy; "
+        "calls are recognized by the commands in `Globals.subroutine_call_commands`. "
+        "If `Globals.map_header_subroutine_indices` is set, the copies are dropped "
+        "and the remaining subroutines renumbered",
+    )
+    argp.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        nargs="?",
+        const=PROFILE_REPORT_PATH,
+        metavar="JSON_PATH",
+        help="time the execution and language table finalization of every room, "
+        "and print a report at exit as well as write it to JSON_PATH "
+        f"(default: '{PROFILE_REPORT_PATH}')",
+    )
+    argp.add_argument(
+        "--size-report",
+        type=pathlib.Path,
+        nargs="?",
+        const=SIZE_REPORT_PATH,
+        metavar="JSON_PATH",
+        help="print the serialized size of every script, subroutine and language "
+        "table (padding included) along with the change since the report in "
+        f"JSON_PATH, then overwrite it (default: '{SIZE_REPORT_PATH}')",
+    )
+    argp.add_argument(
+        "--provenance",
+        type=pathlib.Path,
+        nargs="?",
+        const=PROVENANCE_REPORT_PATH,
+        metavar="JSON_PATH",
+        help="record which script lines and subroutines emit how many commands and "
+        "bytes, and print a report at exit as well as write it to JSON_PATH "
+        f"(default: '{PROVENANCE_REPORT_PATH}'); implies not using the build cache",
+    )
+    args = argp.parse_args(argv)
+    if args.jobs < 0:
+        argp.error("--jobs must not be negative")
+    jobs: int = args.jobs if args.jobs != 0 else os.cpu_count() or 1
+
+    if args.profile is not None:
+        enable_profiling(args.profile)
+    if args.provenance is not None:
+        enable_provenance(args.provenance)
+
+    Globals.fevent_manager = mnllib.FEventScriptManager()
+
+    load_init_module()
+    if args.deduplicate_subroutines and not Globals.subroutine_call_commands:
+        argp.error(
+            "--deduplicate-subroutines requires `Globals.subroutine_call_commands` "
+            "to be set"
+        )
+    text_tables = Globals.text_tables
+
+    room_script_paths = find_room_script_paths()
+    compiled_rooms: dict[int, CompiledRoom] = {}
+    cache_keys: dict[int, bytes] = {}
+    if args.cache:
+        shared_sources_hash = compute_shared_sources_hash()
+        for room_id, script_paths in room_script_paths.items():
+            cache_keys[room_id] = compute_room_cache_key(
+                shared_sources_hash, script_paths
             )
-            language_table.text_tables[text_table_id] = text_table
+            if args.provenance is not None:
+                continue
+            compiled_room = load_cached_room(room_id, cache_keys[room_id])
+            if compiled_room is not None:
+                compiled_rooms[room_id] = compiled_room
+    uncached_room_script_paths = {
+        room_id: script_paths
+        for room_id, script_paths in room_script_paths.items()
+        if room_id not in compiled_rooms
+    }
 
-        if len(language_table.text_tables) <= PADDING_TEXT_TABLE_ID:
-            language_table.text_tables.extend(
-                [None] * (PADDING_TEXT_TABLE_ID - len(language_table.text_tables))
+    worker_provenance_data: dict[int, dict[str, typing.Any]] = {}
+    if jobs != 1 and uncached_room_script_paths:
+        with concurrent.futures.ProcessPoolExecutor(
+            jobs,
+            initializer=_init_compile_worker,
+            initargs=(args.profile is not None, args.provenance is not None),
+        ) as executor:
+            for compiled_room, profile_data, provenance_data in executor.map(
+                _compile_room_in_worker,
+                uncached_room_script_paths.items(),
+                chunksize=max(len(uncached_room_script_paths) // (jobs * 4), 1),
+            ):
+                compiled_rooms[compiled_room.room_id] = compiled_room
+                if profile_data is not None and ProfilingGlobals.profiler is not None:
+                    ProfilingGlobals.profiler.merge_json(profile_data)
+                if provenance_data is not None:
+                    worker_provenance_data[compiled_room.room_id] = provenance_data
+
+    # Rooms are installed in room order, and a room that was compiled without
+    # the text entries earlier rooms emitted for it is compiled again on top of
+    # them, so that the result matches a serial build.
+    for room_id, script_paths in room_script_paths.items():
+        compiled_room = compiled_rooms.get(room_id)
+        if compiled_room is None or not merge_text_table_updates(
+            compiled_room, text_tables
+        ):
+            Globals.text_tables = text_tables
+            compiled_room = compiled_rooms[room_id] = compile_room(
+                room_id, script_paths
             )
-            language_table.text_tables.append(b"")
-            language_table_size = len(language_table.to_bytes(Globals.fevent_manager))
-            language_table.text_tables[PADDING_TEXT_TABLE_ID] = b"\x00" * (
-                (-(language_table_size + 1) % mnllib.FEVENT_LANGUAGE_TABLE_ALIGNMENT)
-                + 1
+            uncached_room_script_paths[room_id] = script_paths
+        elif (
+            room_id in worker_provenance_data and ProvenanceGlobals.recorder is not None
+        ):
+            ProvenanceGlobals.recorder.merge_json(worker_provenance_data[room_id])
+        if args.cache and room_id in uncached_room_script_paths:
+            store_cached_room(compiled_room, cache_keys[room_id])
+        install_compiled_room(compiled_room)
+    Globals.text_tables = text_tables
+
+    if args.optimize:
+        removed_commands = sum(
+            optimize_script(Globals.fevent_manager, script)
+            for room_id in room_script_paths
+            for _, script in compiled_rooms[room_id].scripts
+        )
+        print(f"Optimized away {removed_commands} command(s).")
+
+    if args.deduplicate_subroutines:
+        for room_id in room_script_paths:
+            saved_bytes = sum(
+                deduplicate_subroutines(Globals.fevent_manager, script)
+                for _, script in compiled_rooms[room_id].scripts
             )
+            if saved_bytes != 0:
+                print(
+                    f"Deduplicated subroutines of room 0x{room_id:04X}: "
+                    f"saved {saved_bytes} byte(s)."
+                )
+
+    for room_id, language_table_dict in Globals.text_tables.items():
+        with profile_room("language_table_finalization", room_id):
+            finalize_language_table(room_id, language_table_dict)
+
+    if args.size_report is not None:
+        write_size_report(
+            Globals.fevent_manager,
+            sorted(room_script_paths.keys() | Globals.text_tables.keys()),
+            args.size_report,
+        )
 
     Globals.fevent_manager.save_all()
 
@@ -10,4 +10,11 @@ BATTLE_SCRIPTS_DIR = SCRIPTS_DIR / "battle"
 MENU_SCRIPTS_DIR = SCRIPTS_DIR / "menu"
 SHOP_SCRIPTS_DIR = SCRIPTS_DIR / "shop"
 
+CACHE_DIR = pathlib.Path(".mnlscript_cache")
+FEVENT_CACHE_DIR = CACHE_DIR / "fevent"
+FEVENT_DECOMPILE_MANIFEST_PATH = CACHE_DIR / "fevent_decompile_manifest.json"
+PROFILE_REPORT_PATH = pathlib.Path("mnlscript_profile.json")
+PROVENANCE_REPORT_PATH = pathlib.Path("mnlscript_provenance.json")
+SIZE_REPORT_PATH = pathlib.Path("mnlscript_sizes.json")
+
 FEVENT_SCRIPT_FILENAME_REGEX = re.compile(FEVENT_SCRIPT_NAME_REGEX.pattern + r"\.py")
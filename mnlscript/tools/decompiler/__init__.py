@@ -1,10 +1,15 @@
 from .command_matchers import (
     CommandMatchHandler,  # pyright: ignore [reportUnusedImport]
+    CommandMatchResult,  # pyright: ignore [reportUnusedImport]
     CommandMatcher,  # pyright: ignore [reportUnusedImport]
     command_matchers,  # pyright: ignore [reportUnusedImport]
     command_matcher,  # pyright: ignore [reportUnusedImport]
     CommandsNotMatchedError,  # pyright: ignore [reportUnusedImport]
+    CombinedCommandMatchers,  # pyright: ignore [reportUnusedImport]
+    get_combined_command_matchers,  # pyright: ignore [reportUnusedImport]
     decompile_subroutine_commands,  # pyright: ignore [reportUnusedImport]
 )
 from .decompiler import *
+from .ir import *
 from .misc import *
+from .writer import *
@@ -1,21 +1,32 @@
-import math
-import io
+import hashlib
 import struct
 import re
-import textwrap
+import time
+import collections.abc
 import typing
 
 import mnllib
 
 from ...consts import BubbleType, Sound, TailType, TextboxColor
 from ...utils import fhex, fhex_byte, fhex_int, fhex_short
+from ..profiling import ProfilingGlobals
 from .globals import DecompilerGlobals
+from .ir import (
+    Assignment,
+    AugmentedAssignment,
+    BinaryOperation,
+    Call,
+    Statement,
+    UnaryOperation,
+)
+from .writer import ScriptWriter
 from .misc import (
     decompile_bool_int_or_variable,
     decompile_const_or_variable,
     decompile_enum,
     decompile_text_entry,
     decompile_variable,
+    get_uniform_text_entries,
 )
 
 
@@ -52,31 +63,156 @@ class CommandMatchContext:
         self.subroutine = subroutine
 
 
+CommandMatchResult: typing.TypeAlias = Statement | list[Statement] | None
 CommandMatchHandler: typing.TypeAlias = typing.Callable[
-    [list[mnllib.Command], CommandMatchContext, int], str | None
+    [list[mnllib.Command], CommandMatchContext, int], CommandMatchResult
 ]
 
 
 class CommandMatcher:
     pattern: re.Pattern[str]
     handler: CommandMatchHandler
+    source: str
+    context_dependent: bool
 
-    def __init__(self, pattern: re.Pattern[str], handler: CommandMatchHandler) -> None:
+    def __init__(
+        self,
+        pattern: re.Pattern[str],
+        handler: CommandMatchHandler,
+        source: str | None = None,
+        context_dependent: bool = False,
+    ) -> None:
         self.pattern = pattern
         self.handler = handler
+        self.source = source if source is not None else pattern.pattern
+        self.context_dependent = context_dependent
+
+    @property
+    def name(self) -> str:
+        return f"{self.handler.__name__}({self.source})"
 
 
 command_matchers: list[CommandMatcher] = []
 
 
+COMMAND_PATTERN_GROUP_PREFIX_REGEX = re.compile(
+    r"\(\?(?:P<\w+>|P=\w+\)|#[^)]*\)|[aiLmsux-]*[:)]|[=!]|<[=!])"
+)
+COMMAND_PATTERN_HEX_DIGITS = "0123456789ABCDEF"
+
+
+def parse_command_pattern_atom(pattern: str, pos: int) -> tuple[frozenset[int], int]:
+    if pattern[pos] == ".":
+        return frozenset(range(0x10)), pos + 1
+    if pattern[pos] != "[":
+        return frozenset([int(pattern[pos], base=16)]), pos + 1
+
+    end = pattern.find("]", pos + 1)
+    if end == -1:
+        raise ValueError(f"unterminated character set in command pattern {pattern!r}")
+    negated = pattern[pos + 1] == "^"
+    digits: set[int] = set()
+    for range_match in re.finditer(
+        r"([0-9A-F])(?:-([0-9A-F]))?|(.)",
+        pattern[pos + 1 + negated : end],
+        re.IGNORECASE,
+    ):
+        if range_match.group(3) is not None:
+            raise ValueError(
+                f"invalid character {range_match.group(3)!r} in a character set of "
+                f"command pattern {pattern!r}"
+            )
+        first = int(range_match.group(1), base=16)
+        last = int(range_match.group(2) or range_match.group(1), base=16)
+        digits.update(range(first, last + 1))
+    return frozenset(range(0x10)) - digits if negated else frozenset(digits), end + 1
+
+
+def command_id_character_class(atoms: list[frozenset[int]]) -> str:
+    command_ids = sorted(
+        (((digit0 << 4 | digit1) << 4 | digit2) << 4) | digit3
+        for digit0 in atoms[0]
+        for digit1 in atoms[1]
+        for digit2 in atoms[2]
+        for digit3 in atoms[3]
+    )
+    if len(command_ids) == 1:
+        return f"\\u{command_ids[0]:04X}"
+    ranges: list[str] = []
+    first = last = command_ids[0]
+    for command_id in command_ids[1:] + [-1]:
+        if command_id == last + 1:
+            last = command_id
+            continue
+        ranges.append(
+            f"\\u{first:04X}" if first == last else f"\\u{first:04X}-\\u{last:04X}"
+        )
+        first = last = command_id
+    return f"[{"".join(ranges)}]"
+
+
+def compile_command_pattern(pattern: str, flags: int = 0) -> re.Pattern[str]:
+    translated: list[str] = []
+    atoms: list[frozenset[int]] = []
+    pos = 0
+    while pos < len(pattern):
+        character = pattern[pos]
+        if character.upper() in COMMAND_PATTERN_HEX_DIGITS or character in ".[":
+            if len(atoms) == 4:
+                raise ValueError(
+                    f"command IDs must consist of 4 hex digits in command pattern "
+                    f"{pattern!r}"
+                )
+            atom, pos = parse_command_pattern_atom(pattern, pos)
+            atoms.append(atom)
+            continue
+        if atoms:
+            if character != "," or len(atoms) != 4:
+                raise ValueError(
+                    f"command IDs must consist of 4 hex digits followed by a comma in "
+                    f"command pattern {pattern!r}"
+                )
+            translated.append(command_id_character_class(atoms))
+            atoms = []
+            pos += 1
+            continue
+        group_prefix_match = COMMAND_PATTERN_GROUP_PREFIX_REGEX.match(pattern, pos)
+        if group_prefix_match is not None:
+            translated.append(group_prefix_match.group())
+            pos = group_prefix_match.end()
+        elif character == "{":
+            end = pattern.index("}", pos)
+            translated.append(pattern[pos : end + 1])
+            pos = end + 1
+        elif character == "\\":
+            translated.append(pattern[pos : pos + 2])
+            pos += 2
+        else:
+            translated.append(character)
+            pos += 1
+    if atoms:
+        raise ValueError(
+            f"command IDs must consist of 4 hex digits followed by a comma in "
+            f"command pattern {pattern!r}"
+        )
+    # Case-insensitive matching would make command IDs match their case-folded
+    # counterparts.
+    return re.compile("".join(translated), flags & ~re.IGNORECASE)
+
+
 def command_matcher(
-    pattern: str | re.Pattern[str],
+    pattern: str | re.Pattern[str], *, context_dependent: bool = False
 ) -> typing.Callable[[CommandMatchHandler], CommandMatchHandler]:
-    if not isinstance(pattern, re.Pattern):
-        pattern = re.compile(rf"\b{pattern}(?:\b|$)", re.IGNORECASE)
+    if isinstance(pattern, re.Pattern):
+        source, flags = pattern.pattern, pattern.flags
+    else:
+        source, flags = pattern, 0
+    compiled_pattern = compile_command_pattern(source, flags)
 
     def decorator(handler: CommandMatchHandler) -> CommandMatchHandler:
-        command_matchers.append(CommandMatcher(pattern, handler))
+        command_matchers.append(
+            CommandMatcher(compiled_pattern, handler, source, context_dependent)
+        )
         return handler
 
     return decorator
@@ -87,8 +223,8 @@ def terminate_script(
     _matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return "terminate_script()"
+) -> CommandMatchResult:
+    return Call("terminate_script")
 
 
 @command_matcher("0001,")
@@ -96,8 +232,8 @@ def return_(
     _matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return "return_()"
+) -> CommandMatchResult:
+    return Call("return_")
 
 
 @command_matcher("0004,")
@@ -105,8 +241,10 @@ def wait(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return f"wait({decompile_const_or_variable(matched_commands[0].arguments[0])})"
+) -> CommandMatchResult:
+    return Call(
+        "wait", (decompile_const_or_variable(matched_commands[0].arguments[0]),)
+    )
 
 
 @command_matcher("0005,")
@@ -114,8 +252,10 @@ def push(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return f"push({decompile_const_or_variable(matched_commands[0].arguments[0])})"
+) -> CommandMatchResult:
+    return Call(
+        "push", (decompile_const_or_variable(matched_commands[0].arguments[0]),)
+    )
 
 
 @command_matcher("0006,")
@@ -123,10 +263,15 @@ def pop(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return f"pop({decompile_variable(
-        typing.cast(mnllib.Variable, matched_commands[0].result_variable))
-    })"
+) -> CommandMatchResult:
+    return Call(
+        "pop",
+        (
+            decompile_variable(
+                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
+            ),
+        ),
+    )
 
 
 @command_matcher("0008,")
@@ -134,12 +279,13 @@ def set_variable(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return f"{decompile_variable(
-        typing.cast(mnllib.Variable, matched_commands[0].result_variable))
-    } = {
-        decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-    }"
+) -> CommandMatchResult:
+    return Assignment(
+        decompile_variable(
+            typing.cast(mnllib.Variable, matched_commands[0].result_variable)
+        ),
+        decompile_const_or_variable(matched_commands[0].arguments[0], fhex),
+    )
 
 
 for i, operator in enumerate(["+", "-", "*", "//", "%", "<<", ">>", "&", "|", "^"]):
@@ -150,33 +296,35 @@ for i, operator in enumerate(["+", "-", "*", "//", "%", "<<", ">>", "&", "|", "^
             matched_commands: list[mnllib.Command],
             _context: CommandMatchContext,
             _match_start_index: int,
-        ) -> str | None:
-            return f"{decompile_variable(
-                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-            )} = {
-                decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-            } {operator} {
-                decompile_const_or_variable(matched_commands[0].arguments[1], fhex)
-            }"
+        ) -> CommandMatchResult:
+            return Assignment(
+                decompile_variable(
+                    typing.cast(mnllib.Variable, matched_commands[0].result_variable)
+                ),
+                BinaryOperation(
+                    decompile_const_or_variable(matched_commands[0].arguments[0], fhex),
+                    operator,
+                    decompile_const_or_variable(matched_commands[0].arguments[1], fhex),
+                ),
+            )
 
         @command_matcher(f"{0x0018 + i:04X},")
         def in_place_arithmetic_command(  # pyright: ignore[reportUnusedFunction]
             matched_commands: list[mnllib.Command],
             _context: CommandMatchContext,
             _match_start_index: int,
-        ) -> str | None:
+        ) -> CommandMatchResult:
+            variable = decompile_variable(
+                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
+            )
+            value = decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
             if operator in ["+", "-"] and matched_commands[0].arguments[0] in [1, -1]:
-                return f"{"add" if operator == "+" else "subtract"}_in_place({
-                    decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-                }, {decompile_variable(
-                    typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-                )})"
+                return Call(
+                    f"{"add" if operator == "+" else "subtract"}_in_place",
+                    (value, variable),
+                )
 
-            return f"{decompile_variable(
-                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-            )} {operator}= {
-                decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-            }"
+            return AugmentedAssignment(variable, operator, value)
 
     factory(i, operator)
 
@@ -188,12 +336,16 @@ for command_id, operator in {0x0013: "-", 0x0015: "~"}.items():
             matched_commands: list[mnllib.Command],
             _context: CommandMatchContext,
             _match_start_index: int,
-        ) -> str | None:
-            return f"{decompile_variable(
-                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-            )} = {operator}{
-                decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-            }"
+        ) -> CommandMatchResult:
+            return Assignment(
+                decompile_variable(
+                    typing.cast(mnllib.Variable, matched_commands[0].result_variable)
+                ),
+                UnaryOperation(
+                    operator,
+                    decompile_const_or_variable(matched_commands[0].arguments[0], fhex),
+                ),
+            )
 
     factory(command_id, operator)
 
@@ -205,10 +357,14 @@ for i, operator in enumerate(["+", "-"]):
             matched_commands: list[mnllib.Command],
             _context: CommandMatchContext,
             _match_start_index: int,
-        ) -> str | None:
-            return f"{decompile_variable(
-                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-            )} {operator}= 1"
+        ) -> CommandMatchResult:
+            return AugmentedAssignment(
+                decompile_variable(
+                    typing.cast(mnllib.Variable, matched_commands[0].result_variable)
+                ),
+                operator,
+                "1",
+            )
 
     factory(i, operator)
 
@@ -238,12 +394,18 @@ for command_id, command_function in {
             matched_commands: list[mnllib.Command],
             _context: CommandMatchContext,
             _match_start_index: int,
-        ) -> str | None:
-            return f"{command_function}({
-                decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-            }, {decompile_variable(
-                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-            )})"
+        ) -> CommandMatchResult:
+            return Call(
+                command_function,
+                (
+                    decompile_const_or_variable(matched_commands[0].arguments[0], fhex),
+                    decompile_variable(
+                        typing.cast(
+                            mnllib.Variable, matched_commands[0].result_variable
+                        )
+                    ),
+                ),
+            )
 
     factory(command_id, command_function)
 
@@ -263,26 +425,31 @@ for command_id, command_function in {
             matched_commands: list[mnllib.Command],
             _context: CommandMatchContext,
             _match_start_index: int,
-        ) -> str | None:
-            return f"{command_function}({
-                decompile_const_or_variable(matched_commands[0].arguments[0], fhex)
-            }, {
-                decompile_const_or_variable(matched_commands[0].arguments[1], fhex)
-            }, {decompile_variable(
-                typing.cast(mnllib.Variable, matched_commands[0].result_variable)
-            )})"
+        ) -> CommandMatchResult:
+            return Call(
+                command_function,
+                (
+                    decompile_const_or_variable(matched_commands[0].arguments[0], fhex),
+                    decompile_const_or_variable(matched_commands[0].arguments[1], fhex),
+                    decompile_variable(
+                        typing.cast(
+                            mnllib.Variable, matched_commands[0].result_variable
+                        )
+                    ),
+                ),
+            )
 
     factory(command_id, command_function)
 
 
-@command_matcher("(?:0096,)?01B[9A],(?:01BD,)?(?:0096,)?")
+@command_matcher("(?:0096,)?01B[9A],(?:01BD,)?(?:0096,)?", context_dependent=True)
 def say(
     matched_commands: list[mnllib.Command],
     context: CommandMatchContext,
     match_start_index: int,
-) -> str | None:
-    result = io.StringIO()
-    result_post = io.StringIO()
+) -> CommandMatchResult:
+    result: list[Statement] = []
+    result_post: list[Statement] = []
 
     anim: int | mnllib.Variable | None = None
     if matched_commands[0].command_id == 0x0096:
@@ -291,8 +458,11 @@ def say(
             or matched_commands[0].arguments[0] != matched_commands[1].arguments[0]
             or matched_commands[0].arguments[2] != 0x01
         ):
-            result.write(
-                f"{set_animation(matched_commands[:1], context, match_start_index)}\n"
+            result.append(
+                typing.cast(
+                    Statement,
+                    set_animation(matched_commands[:1], context, match_start_index),
+                )
             )
         else:
             anim = matched_commands[0].arguments[1]
@@ -303,10 +473,13 @@ def say(
     if len(matched_commands) >= 2 and matched_commands[1].command_id == 0x01BD:
         wait_command_unk1 = matched_commands[1].arguments[0]
         if wait_command_unk1 != 0x00:
-            result_post.write(
-                f"\n{wait_for_textbox(
-                    matched_commands[1:2], context, match_start_index + 1
-                )}"
+            result_post.append(
+                typing.cast(
+                    Statement,
+                    wait_for_textbox(
+                        matched_commands[1:2], context, match_start_index + 1
+                    ),
+                )
             )
         del matched_commands[1]
 
@@ -317,10 +490,13 @@ def say(
             or matched_commands[1].arguments[0] != matched_commands[0].arguments[0]
             or matched_commands[1].arguments[2] != 0x01
         ):
-            result_post.write(
-                f"\n{set_animation(
-                    matched_commands[1:2], context, match_start_index + 1
-                )}"
+            result_post.append(
+                typing.cast(
+                    Statement,
+                    set_animation(
+                        matched_commands[1:2], context, match_start_index + 1
+                    ),
+                )
             )
         else:
             post_anim = matched_commands[1].arguments[1]
@@ -341,7 +517,11 @@ def say(
                 f"an mnllib.LanguageTable, but rather '{type(language_table).__name__}'"
             )
         message = decompile_text_entry(
-            language_table, typing.cast(int, text_entry_index)
+            language_table,
+            typing.cast(int, text_entry_index),
+            uniform=get_uniform_text_entries(room_id, language_table)[
+                typing.cast(int, text_entry_index)
+            ],
         )
         DecompilerGlobals.next_text_entry_index[room_id] += 1
     else:
@@ -362,92 +542,118 @@ def say(
             common_args[9], lambda value: decompile_enum(Sound, value, fhex_int)
         ),
         message,
-        f"anim={
-            decompile_const_or_variable(
-                anim, fhex_byte
-            ) if anim is not None else "None"
-        }",
-        f"post_anim={
-            decompile_const_or_variable(
-                post_anim, fhex_byte
-            ) if post_anim is not None else "None"
-        }",
+    ]
+    keyword_arguments: list[tuple[str, str]] = [
+        (
+            "anim",
+            (
+                decompile_const_or_variable(anim, fhex_byte)
+                if anim is not None
+                else "None"
+            ),
+        ),
+        (
+            "post_anim",
+            (
+                decompile_const_or_variable(post_anim, fhex_byte)
+                if post_anim is not None
+                else "None"
+            ),
+        ),
     ]
     if common_args[2] != BubbleType.NORMAL:
-        arguments.append(
-            f"bubble={decompile_const_or_variable(
-                common_args[2],
-                lambda value: decompile_enum(BubbleType, value, fhex_byte)
-            )}"
+        keyword_arguments.append(
+            (
+                "bubble",
+                decompile_const_or_variable(
+                    common_args[2],
+                    lambda value: decompile_enum(BubbleType, value, fhex_byte),
+                ),
+            )
         )
     if common_args[3] != TailType.NORMAL:
-        arguments.append(
-            f"tail={decompile_const_or_variable(
-                common_args[3],
-                lambda value: decompile_enum(TailType, value, fhex_byte)
-            )}"
+        keyword_arguments.append(
+            (
+                "tail",
+                decompile_const_or_variable(
+                    common_args[3],
+                    lambda value: decompile_enum(TailType, value, fhex_byte),
+                ),
+            )
         )
     if common_args[8] != 0:
-        arguments.append(
-            f"wait={
-                "False" if common_args[8] == 1
-                else decompile_const_or_variable(common_args[8], fhex_byte)
-            }"
+        keyword_arguments.append(
+            (
+                "wait",
+                (
+                    "False"
+                    if common_args[8] == 1
+                    else decompile_const_or_variable(common_args[8], fhex_byte)
+                ),
+            )
         )
     if matched_commands[0].arguments[-1] != TextboxColor.NORMAL:
-        arguments.append(
-            f"color={decompile_const_or_variable(
-                matched_commands[0].arguments[-1],
-                lambda value: decompile_enum(TextboxColor, value, fhex_byte)
-            )}"
+        keyword_arguments.append(
+            (
+                "color",
+                decompile_const_or_variable(
+                    matched_commands[0].arguments[-1],
+                    lambda value: decompile_enum(TextboxColor, value, fhex_byte),
+                ),
+            )
         )
     if common_args[0] != 0:
-        arguments.append(f"width={decompile_const_or_variable(common_args[0])}")
+        keyword_arguments.append(("width", decompile_const_or_variable(common_args[0])))
     if common_args[1] != 0:
-        arguments.append(f"height={decompile_const_or_variable(common_args[1])}")
+        keyword_arguments.append(
+            ("height", decompile_const_or_variable(common_args[1]))
+        )
     if common_args[4] != -1:
-        arguments.append(
-            f"tail_size={decompile_const_or_variable(common_args[4], fhex_byte)}"
+        keyword_arguments.append(
+            ("tail_size", decompile_const_or_variable(common_args[4], fhex_byte))
         )
     if common_args[5] != -1:
-        arguments.append(
-            f"tail_direction={decompile_const_or_variable(common_args[5], fhex_byte)}"
+        keyword_arguments.append(
+            ("tail_direction", decompile_const_or_variable(common_args[5], fhex_byte))
         )
     if isinstance(common_args[6], int):
         tail_hoffset, textbox_hoffset = struct.unpack(
             "<bb", struct.pack("<h", common_args[6])
         )
         if textbox_hoffset != -1:
-            arguments.append(f"textbox_hoffset={fhex(textbox_hoffset, 2)}")
+            keyword_arguments.append(("textbox_hoffset", fhex(textbox_hoffset, 2)))
         if tail_hoffset != -1:
-            arguments.append(f"tail_hoffset={fhex(tail_hoffset, 2)}")
+            keyword_arguments.append(("tail_hoffset", fhex(tail_hoffset, 2)))
     else:
-        arguments.append(
-            f"hoffsets_arg={decompile_const_or_variable(common_args[6], fhex_short)}"
+        keyword_arguments.append(
+            ("hoffsets_arg", decompile_const_or_variable(common_args[6], fhex_short))
         )
     if common_args[8] != 0 and wait_command_unk1 == 0x00:
-        arguments.append("force_wait_command=True")
+        keyword_arguments.append(("force_wait_command", "True"))
     if common_args[8] == 0 and wait_command_unk1 != 0x00:
-        arguments.append("force_wait_command=False")
+        keyword_arguments.append(("force_wait_command", "False"))
     result_variable = typing.cast(mnllib.Variable, matched_commands[0].result_variable)
     if result_variable.number != 0x1000:
-        arguments.append(f"res={decompile_variable(result_variable)}")
+        keyword_arguments.append(("res", decompile_variable(result_variable)))
     if common_args[7] != 0x01:
-        arguments.append(
-            f"unk9={decompile_const_or_variable(common_args[7], fhex_byte)}"
+        keyword_arguments.append(
+            ("unk9", decompile_const_or_variable(common_args[7], fhex_byte))
         )
     if (
         matched_commands[0].command_id == 0x01B9
         and matched_commands[0].arguments[13] != 0x0000
     ):
-        arguments.append(
-            f"unk14={decompile_const_or_variable(
-                matched_commands[0].arguments[13], fhex_short
-            )}"
+        keyword_arguments.append(
+            (
+                "unk14",
+                decompile_const_or_variable(
+                    matched_commands[0].arguments[13], fhex_short
+                ),
+            )
         )
-    result.write(f"say({", ".join(arguments)})")
+    result.append(Call("say", tuple(arguments), tuple(keyword_arguments)))
 
-    return result.getvalue() + result_post.getvalue()
+    return result + result_post
 
 
 @command_matcher("0096,")
@@ -455,15 +661,30 @@ def set_animation(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return f"set_animation({
-        decompile_const_or_variable(matched_commands[0].arguments[0], fhex_byte)
-        if matched_commands[0].arguments[0] != -1 else "Self"
-    }, {
-        decompile_const_or_variable(matched_commands[0].arguments[1], fhex_byte)
-    }{f", unk3={
-        decompile_const_or_variable(matched_commands[0].arguments[2], fhex_byte)
-    }" if matched_commands[0].arguments[2] != 0x01 else ""})"
+) -> CommandMatchResult:
+    return Call(
+        "set_animation",
+        (
+            (
+                decompile_const_or_variable(matched_commands[0].arguments[0], fhex_byte)
+                if matched_commands[0].arguments[0] != -1
+                else "Self"
+            ),
+            decompile_const_or_variable(matched_commands[0].arguments[1], fhex_byte),
+        ),
+        (
+            (
+                (
+                    "unk3",
+                    decompile_const_or_variable(
+                        matched_commands[0].arguments[2], fhex_byte
+                    ),
+                ),
+            )
+            if matched_commands[0].arguments[2] != 0x01
+            else ()
+        ),
+    )
 
 
 @command_matcher("01BD,")
@@ -471,10 +692,22 @@ def wait_for_textbox(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return f"wait_for_textbox({f"unk1={
-        decompile_const_or_variable(matched_commands[0].arguments[0], fhex_byte)
-    }" if matched_commands[0].arguments[0] != 0x00 else ""})"
+) -> CommandMatchResult:
+    return Call(
+        "wait_for_textbox",
+        keyword_arguments=(
+            (
+                (
+                    "unk1",
+                    decompile_const_or_variable(
+                        matched_commands[0].arguments[0], fhex_byte
+                    ),
+                ),
+            )
+            if matched_commands[0].arguments[0] != 0x00
+            else ()
+        ),
+    )
 
 
 @command_matcher("0199,")
@@ -482,27 +715,36 @@ def show_save_dialog(
     matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    args: list[str] = []
+) -> CommandMatchResult:
+    keyword_arguments: list[tuple[str, str]] = []
     if matched_commands[0].arguments[2] != 1:
-        args.append(
-            f"fade_in={decompile_bool_int_or_variable(
-                matched_commands[0].arguments[2], fhex_byte,
-            )}"
+        keyword_arguments.append(
+            (
+                "fade_in",
+                decompile_bool_int_or_variable(
+                    matched_commands[0].arguments[2], fhex_byte
+                ),
+            )
         )
     if matched_commands[0].arguments[0] != 0x00:
-        args.append(
-            f"unk1={decompile_const_or_variable(
-                matched_commands[0].arguments[0], fhex_byte,
-            )}"
+        keyword_arguments.append(
+            (
+                "unk1",
+                decompile_const_or_variable(
+                    matched_commands[0].arguments[0], fhex_byte
+                ),
+            )
         )
     if matched_commands[0].arguments[1] != 0x01:
-        args.append(
-            f"unk2={decompile_const_or_variable(
-                matched_commands[0].arguments[1], fhex_byte,
-            )}"
+        keyword_arguments.append(
+            (
+                "unk2",
+                decompile_const_or_variable(
+                    matched_commands[0].arguments[1], fhex_byte
+                ),
+            )
         )
-    return f"show_save_dialog({", ".join(args)})"
+    return Call("show_save_dialog", keyword_arguments=tuple(keyword_arguments))
 
 
 @command_matcher("01AE,")
@@ -510,8 +752,8 @@ def swap_screens(
     _matched_commands: list[mnllib.Command],
     _context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
-    return "swap_screens()"
+) -> CommandMatchResult:
+    return Call("swap_screens")
 
 
 @command_matcher("....,")
@@ -519,7 +761,7 @@ def unknown_command(
     matched_commands: list[mnllib.Command],
     context: CommandMatchContext,
     _match_start_index: int,
-) -> str | None:
+) -> CommandMatchResult:
     formatted_args = [
         decompile_const_or_variable(
             argument,
@@ -535,15 +777,12 @@ def unknown_command(
         )
         for i, argument in enumerate(matched_commands[0].arguments)
     ]
-    return f"emit_command({fhex(matched_commands[0].command_id, 4)}{
-        f", [{", ".join(formatted_args)}]"
-        if len(formatted_args) > 0 or matched_commands[0].result_variable is not None
-        else ""
-    }{
-        f", {decompile_variable(matched_commands[0].result_variable)}"
-        if matched_commands[0].result_variable is not None
-        else ""
-    })"
+    arguments = [fhex(matched_commands[0].command_id, 4)]
+    if len(formatted_args) > 0 or matched_commands[0].result_variable is not None:
+        arguments.append(f"[{", ".join(formatted_args)}]")
+    if matched_commands[0].result_variable is not None:
+        arguments.append(decompile_variable(matched_commands[0].result_variable))
+    return Call("emit_command", tuple(arguments))
 
 
 class CommandsNotMatchedError(Exception):
@@ -573,6 +812,119 @@ class CommandsNotMatchedError(Exception):
         return self.__class__, (self.subroutine, self.match_start_index, self.message)
 
 
+class CombinedCommandMatchers:
+    matchers: list[CommandMatcher]
+    matcher_names: list[str]
+    # Consecutive matchers are combined into one alternation per segment, except
+    # for those that refer to groups, which get a segment of their own.
+    segments: list[tuple[re.Pattern[str], dict[int, int] | int]]
+
+    INLINE_FLAGS: typing.ClassVar[dict[re.RegexFlag, str]] = {
+        re.ASCII: "a",
+        re.IGNORECASE: "i",
+        re.MULTILINE: "m",
+        re.DOTALL: "s",
+        re.VERBOSE: "x",
+    }
+    GROUP_REFERENCE_REGEX: typing.ClassVar[re.Pattern[str]] = re.compile(
+        r"\\[1-9]|\(\?P=|\(\?\("
+    )
+
+    def __init__(self, matchers: collections.abc.Sequence[CommandMatcher]) -> None:
+        self.matchers = list(matchers)
+        self.matcher_names = [matcher.name for matcher in self.matchers]
+        self.segments = []
+
+        alternatives: list[str] = []
+        group_matcher_indices: dict[int, int] = {}
+        group_index = 1
+        for i, matcher in enumerate(self.matchers):
+            if not self.is_combinable(matcher.pattern):
+                if alternatives:
+                    self.segments.append(
+                        (re.compile("|".join(alternatives)), group_matcher_indices)
+                    )
+                    alternatives = []
+                    group_matcher_indices = {}
+                    group_index = 1
+                self.segments.append((matcher.pattern, i))
+                continue
+
+            inline_flags = "".join(
+                [
+                    letter
+                    for flag, letter in self.INLINE_FLAGS.items()
+                    if matcher.pattern.flags & flag
+                ]
+            )
+            # The newline ends a trailing comment of a verbose pattern.
+            alternatives.append(
+                f"((?{inline_flags}:{matcher.pattern.pattern}{
+                    "\n" if matcher.pattern.flags & re.VERBOSE else ""
+                }))"
+                if inline_flags
+                else f"({matcher.pattern.pattern})"
+            )
+            group_matcher_indices[group_index] = i
+            group_index += 1 + matcher.pattern.groups
+        if alternatives:
+            self.segments.append(
+                (re.compile("|".join(alternatives)), group_matcher_indices)
+            )
+
+    @classmethod
+    def is_combinable(cls, pattern: re.Pattern[str]) -> bool:
+        # Group numbers shift and group names may clash inside the alternation.
+        return (
+            not pattern.groupindex
+            and cls.GROUP_REFERENCE_REGEX.search(pattern.pattern) is None
+        )
+
+    def match(self, string: str, pos: int) -> tuple[int, re.Match[str]] | None:
+        for pattern, matcher_indices in self.segments:
+            match = pattern.match(string, pos)
+            if match is None:
+                continue
+            if isinstance(matcher_indices, int):
+                return matcher_indices, match
+            return matcher_indices[typing.cast(int, match.lastindex)], match
+        return None
+
+
+SUBROUTINE_BODY_CACHE_LIMIT = 0x4000
+SUBROUTINE_BODY_CACHE_NAME = "(subroutine body cache)"
+
+_combined_command_matchers: dict[int, CombinedCommandMatchers] = {}
+_combined_command_matchers_source: list[CommandMatcher] = []
+
+
+def refresh_combined_command_matchers() -> None:
+    if _combined_command_matchers_source != command_matchers:
+        _combined_command_matchers.clear()
+        _combined_command_matchers_source[:] = command_matchers
+
+
+def get_combined_command_matchers(
+    start_index: int = 0, *, refresh: bool = True
+) -> CombinedCommandMatchers:
+    if refresh:
+        refresh_combined_command_matchers()
+
+    combined_matchers = _combined_command_matchers.get(start_index)
+    if combined_matchers is None:
+        combined_matchers = CombinedCommandMatchers(command_matchers[start_index:])
+        _combined_command_matchers[start_index] = combined_matchers
+    return combined_matchers
+
+
+def get_subroutine_bodies(manager: mnllib.MnLScriptManager) -> dict[bytes, str]:
+    source = (manager, DecompilerGlobals.statement_printer, *command_matchers)
+    if DecompilerGlobals.subroutine_bodies_source != source:
+        DecompilerGlobals.subroutine_bodies.clear()
+        DecompilerGlobals.subroutine_bodies_source = source
+    return DecompilerGlobals.subroutine_bodies
+
+
 def decompile_subroutine_commands(
     manager: mnllib.MnLScriptManager,
     subroutine: mnllib.Subroutine,
@@ -580,21 +932,72 @@ def decompile_subroutine_commands(
         mnllib.FEventScript | None, mnllib.FEventChunk | None, mnllib.FEventChunk | None
     ],
     script_index: int,
-    output: typing.TextIO,
+    output: ScriptWriter,
     line_prefix: str,
+    start: int = 0,
+    end: int | None = None,
 ) -> None:
-    commands_string = "".join(
-        [f"{command.command_id:04X}," for command in subroutine.commands]
+    if end is None:
+        end = len(subroutine.commands)
+    commands = subroutine.commands[start:end]
+
+    profiler = ProfilingGlobals.profiler
+    lookup_start = time.perf_counter() if profiler is not None else 0.0
+    subroutine_bodies = get_subroutine_bodies(manager)
+    body_key = (
+        line_prefix,
+        *[
+            (
+                command.command_id,
+                *[
+                    (
+                        (argument.number,)
+                        if isinstance(argument, mnllib.Variable)
+                        else argument
+                    )
+                    for argument in command.arguments
+                ],
+                (
+                    command.result_variable.number
+                    if command.result_variable is not None
+                    else None
+                ),
+            )
+            for command in commands
+        ],
     )
+    body_digest = hashlib.blake2b(repr(body_key).encode(), digest_size=16).digest()
+    body = subroutine_bodies.get(body_digest)
+    if profiler is not None:
+        profiler.record_cache_lookup(
+            SUBROUTINE_BODY_CACHE_NAME,
+            body is not None,
+            time.perf_counter() - lookup_start,
+        )
+    if body is not None:
+        output.write(body)
+        return
+
+    opcodes = "".join([chr(command.command_id) for command in commands])
+    refresh_combined_command_matchers()
     context = CommandMatchContext(manager, chunk_triple, script_index, subroutine)
-    command_index = 0
-    while command_index < len(subroutine.commands):
-        for matcher in command_matchers:
-            match = matcher.pattern.match(commands_string, pos=command_index * 5)
-            if match is None:
-                continue
-            match_start, match_end = match.span()
-            matched_commands_number = math.ceil((match_end - match_start) / 5)
+    body_output = ScriptWriter()
+    context_dependent = False
+    command_index = start
+    while command_index < end:
+        start_matcher_index = 0
+        while True:
+            combined_matchers = get_combined_command_matchers(
+                start_matcher_index, refresh=False
+            )
+            result = combined_matchers.match(opcodes, command_index - start)
+            if result is None:
+                raise CommandsNotMatchedError(subroutine, command_index)
+            matcher_index, match = result
+            matched_commands_number = match.end() - match.start()
+            matcher = combined_matchers.matchers[matcher_index]
+            context_dependent |= matcher.context_dependent
+            handler_start = time.perf_counter() if profiler is not None else 0.0
             decompiled_match = matcher.handler(
                 subroutine.commands[
                     command_index : command_index + matched_commands_number
@@ -602,12 +1005,27 @@ def decompile_subroutine_commands(
                 context,
                 command_index,
             )
+            if profiler is not None:
+                profiler.record_match(
+                    combined_matchers.matcher_names,
+                    matcher_index,
+                    decompiled_match is not None,
+                    time.perf_counter() - handler_start,
+                )
             if decompiled_match is None:
+                start_matcher_index += matcher_index + 1
                 continue
-            if command_index != 0:
-                output.write("\n")
-            output.write(textwrap.indent(decompiled_match, prefix=line_prefix))
+            if command_index != start:
+                body_output.write("\n")
+            body_output.write_indented(
+                DecompilerGlobals.statement_printer.print(decompiled_match), line_prefix
+            )
             command_index += matched_commands_number
             break
-        else:
-            raise CommandsNotMatchedError(subroutine, command_index)
+
+    body = body_output.getvalue()
+    if not context_dependent:
+        if len(subroutine_bodies) >= SUBROUTINE_BODY_CACHE_LIMIT:
+            del subroutine_bodies[next(iter(subroutine_bodies))]
+        subroutine_bodies[body_digest] = body
+    output.write(body)
@@ -1,5 +1,10 @@
+import argparse
+import collections.abc
+import concurrent.futures
+import hashlib
+import json
+import os
 import pathlib
-import copy
 import textwrap
 import pprint
 import typing
@@ -9,10 +14,17 @@ import mnllib
 from ...consts import PADDING_TEXT_TABLE_ID
 from ...text import LANGUAGE_IDS
 from ...utils import fhex
-from ..consts import FEVENT_SCRIPTS_DIR
+from ..consts import (
+    FEVENT_DECOMPILE_MANIFEST_PATH,
+    FEVENT_SCRIPTS_DIR,
+    PROFILE_REPORT_PATH,
+)
+from ..fingerprint import compute_toolchain_fingerprint
+from ..profiling import ProfilingGlobals, enable_profiling, profile_room
 from .command_matchers import decompile_subroutine_commands
 from .globals import DecompilerGlobals
-from .misc import decompile_text_entry
+from .misc import decompile_text_entry, get_uniform_text_entries
+from .writer import BackgroundFileWriter, ScriptWriter, write_if_changed
 
 
 def decompile_subroutine(
@@ -23,16 +35,13 @@ def decompile_subroutine(
     ],
     script_index: int,
     index: int | None,
-    output: typing.TextIO,
+    output: ScriptWriter,
 ) -> None:
-    processed_subroutine = copy.deepcopy(subroutine)
+    commands_end = len(subroutine.commands)
     has_return = False
-    if (
-        len(processed_subroutine.commands) > 0
-        and processed_subroutine.commands[-1].command_id == 0x0001
-    ):
+    if commands_end > 0 and subroutine.commands[-1].command_id == 0x0001:
         has_return = True
-        del processed_subroutine.commands[-1]
+        commands_end -= 1
 
     decorator_args: list[str] = []
     if index is None:
@@ -50,9 +59,15 @@ def decompile_subroutine(
         )
     )
 
-    if len(processed_subroutine.commands) > 0:
+    if commands_end > 0:
         decompile_subroutine_commands(
-            manager, processed_subroutine, chunk_triple, script_index, output, " " * 4
+            manager,
+            subroutine,
+            chunk_triple,
+            script_index,
+            output,
+            " " * 4,
+            end=commands_end,
         )
     else:
         output.write("    pass")
@@ -65,7 +80,8 @@ def decompile_script(
         mnllib.FEventScript | None, mnllib.FEventChunk | None, mnllib.FEventChunk | None
     ],
     index: int,
-    output: typing.TextIO,
+    output: ScriptWriter,
+    language_table_size: int | None = None,
 ) -> None:
     output.write(
         textwrap.dedent(
@@ -115,6 +131,7 @@ def decompile_script(
         output.write("\n")
 
         if DecompilerGlobals.next_text_entry_index[room_id] != 0:
+            uniform_text_entries = get_uniform_text_entries(room_id, chunk_triple[2])
             first = True
             for text_entry_index in range(
                 DecompilerGlobals.next_text_entry_index[room_id],
@@ -132,11 +149,13 @@ def decompile_script(
                     f"\nemit_text_entry({decompile_text_entry(
                         chunk_triple[2],
                         text_entry_index,
-                        implicit_text_entry_definition=True
+                        implicit_text_entry_definition=True,
+                        uniform=uniform_text_entries[text_entry_index],
                     )})  # {fhex(text_entry_index, 2)}"
                 )
 
-        language_table_size = len(chunk_triple[2].to_bytes(manager))
+        if language_table_size is None:
+            language_table_size = len(chunk_triple[2].to_bytes(manager))
         for i, text_table in enumerate(chunk_triple[2].text_tables):
             # if i == PADDING_TEXT_TABLE_ID:
             #     if not isinstance(text_table, bytes) or not (
@@ -207,25 +226,234 @@ def decompile_script(
     output.write("\n")
 
 
-def main() -> None:
+def decompile_room(
+    manager: mnllib.MnLScriptManager,
+    room_id: int,
+    chunk_triple: tuple[
+        mnllib.FEventScript | None, mnllib.FEventChunk | None, mnllib.FEventChunk | None
+    ],
+    language_table_size: int | None = None,
+) -> list[tuple[pathlib.Path, str]]:
+    decompiled_scripts: list[tuple[pathlib.Path, str]] = []
+    for i, chunk in enumerate(chunk_triple):
+        if not isinstance(chunk, mnllib.FEventScript):
+            continue
+        output = ScriptWriter()
+        with profile_room("decompile_script", room_id):
+            decompile_script(
+                manager,
+                chunk,
+                chunk_triple,
+                room_id * 3 + i,
+                output,
+                language_table_size,
+            )
+        decompiled_scripts.append((script_path(room_id, i), output.getvalue()))
+    return decompiled_scripts
+
+
+def script_path(room_id: int, triple_index: int) -> pathlib.Path:
+    return pathlib.Path(
+        FEVENT_SCRIPTS_DIR,
+        f"{room_id:04x}{f"_{triple_index}" if triple_index != 0 else ""}.py",
+    )
+
+
+def write_decompiled_rooms(
+    decompiled_rooms: collections.abc.Iterable[list[tuple[pathlib.Path, str]]],
+    write_threads: int = 0,
+) -> None:
+    with BackgroundFileWriter(write_threads) as writer:
+        for decompiled_scripts in decompiled_rooms:
+            for path, source in decompiled_scripts:
+                writer.write(path, source)
+
+
+def compute_chunk_triple_hash(
+    manager: mnllib.MnLScriptManager,
+    chunk_triple: tuple[
+        mnllib.FEventScript | None, mnllib.FEventChunk | None, mnllib.FEventChunk | None
+    ],
+) -> tuple[str, int | None]:
+    triple_hash = hashlib.sha256()
+    language_table_size: int | None = None
+    for chunk in chunk_triple:
+        if chunk is None:
+            triple_hash.update(b"\x00")
+            continue
+        chunk_data = chunk.to_bytes(manager)
+        if isinstance(chunk, mnllib.LanguageTable):
+            language_table_size = len(chunk_data)
+        triple_hash.update(type(chunk).__name__.encode())
+        triple_hash.update(len(chunk_data).to_bytes(4, "little"))
+        triple_hash.update(chunk_data)
+    return triple_hash.hexdigest(), language_table_size
+
+
+def load_decompile_manifest(fingerprint: str) -> dict[int, str]:
+    try:
+        with FEVENT_DECOMPILE_MANIFEST_PATH.open() as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("fingerprint") != fingerprint:
+        return {}
+    return {
+        int(room_id, base=16): room_hash
+        for room_id, room_hash in manifest["rooms"].items()
+    }
+
+
+def save_decompile_manifest(fingerprint: str, room_hashes: dict[int, str]) -> None:
+    FEVENT_DECOMPILE_MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    write_if_changed(
+        FEVENT_DECOMPILE_MANIFEST_PATH,
+        json.dumps(
+            {
+                "fingerprint": fingerprint,
+                "rooms": {
+                    fhex(room_id, 4): room_hash
+                    for room_id, room_hash in sorted(room_hashes.items())
+                },
+            },
+            indent=2,
+        )
+        + "\n",
+    )
+
+
+def _init_decompile_worker(profile: bool) -> None:
+    DecompilerGlobals.fevent_manager = mnllib.FEventScriptManager()
+    if profile:
+        enable_profiling()
+
+
+def _decompile_room_in_worker(
+    room_id: int, language_table_size: int | None
+) -> tuple[list[tuple[pathlib.Path, str]], dict[str, typing.Any] | None]:
+    decompiled_scripts = decompile_room(
+        DecompilerGlobals.fevent_manager,
+        room_id,
+        DecompilerGlobals.fevent_manager.fevent_chunks[room_id],
+        language_table_size,
+    )
+    profiler = ProfilingGlobals.profiler
+    return decompiled_scripts, profiler.take() if profiler is not None else None
+
+
+def _merge_worker_profiles(
+    results: collections.abc.Iterable[
+        tuple[list[tuple[pathlib.Path, str]], dict[str, typing.Any] | None]
+    ],
+) -> collections.abc.Iterator[list[tuple[pathlib.Path, str]]]:
+    for decompiled_scripts, profile_data in results:
+        if profile_data is not None and ProfilingGlobals.profiler is not None:
+            ProfilingGlobals.profiler.merge_json(profile_data)
+        yield decompiled_scripts
+
+
+def main(argv: collections.abc.Sequence[str] | None = None) -> None:
+    argp = argparse.ArgumentParser(
+        description="Decompile the FEvent scripts of the ROM into Python scripts."
+    )
+    argp.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes to decompile rooms in "
+        "(0 for one per CPU; default: %(default)s)",
+    )
+    argp.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="decompile every room, even the ones that have not changed since the "
+        "last run",
+    )
+    argp.add_argument(
+        "--write-threads",
+        type=int,
+        default=4,
+        help="number of background threads to write the scripts in while the "
+        "next rooms are decompiled (0 to write them in the main thread; "
+        "default: %(default)s)",
+    )
+    argp.add_argument(
+        "--profile",
+        type=pathlib.Path,
+        nargs="?",
+        const=PROFILE_REPORT_PATH,
+        metavar="JSON_PATH",
+        help="time every command matcher and room, and print a report at exit "
+        f"as well as write it to JSON_PATH (default: '{PROFILE_REPORT_PATH}')",
+    )
+    args = argp.parse_args(argv)
+    if args.jobs < 0:
+        argp.error("--jobs must not be negative")
+    if args.write_threads < 0:
+        argp.error("--write-threads must not be negative")
+    jobs: int = args.jobs if args.jobs != 0 else os.cpu_count() or 1
+
+    if args.profile is not None:
+        enable_profiling(args.profile)
+
     fevent_manager = mnllib.FEventScriptManager()
+    DecompilerGlobals.fevent_manager = fevent_manager
 
     FEVENT_SCRIPTS_DIR.mkdir(parents=True, exist_ok=True)
     (FEVENT_SCRIPTS_DIR / "__init__.py").touch()
 
+    fingerprint = compute_toolchain_fingerprint()
+    previous_room_hashes = (
+        load_decompile_manifest(fingerprint) if not args.force else {}
+    )
+    room_hashes: dict[int, str] = {}
+    language_table_sizes: dict[int, int | None] = {}
+    room_ids: list[int] = []
     for room_id, chunk_triple in enumerate(fevent_manager.fevent_chunks):
-        for i, chunk in enumerate(chunk_triple):
-            if not isinstance(chunk, mnllib.FEventScript):
-                continue
-            path = pathlib.Path(
-                FEVENT_SCRIPTS_DIR, f"{room_id:04x}{f"_{i}" if i != 0 else ""}.py"
-            )
-            # if path.exists():  # TODO
-            #     continue
-            with path.open("w") as file:
-                decompile_script(
-                    fevent_manager, chunk, chunk_triple, room_id * 3 + i, file
+        room_hashes[room_id], language_table_sizes[room_id] = compute_chunk_triple_hash(
+            fevent_manager, chunk_triple
+        )
+        if room_hashes[room_id] != previous_room_hashes.get(room_id) or not all(
+            script_path(room_id, i).is_file()
+            for i, chunk in enumerate(chunk_triple)
+            if isinstance(chunk, mnllib.FEventScript)
+        ):
+            room_ids.append(room_id)
+
+    if jobs == 1:
+        write_decompiled_rooms(
+            (
+                decompile_room(
+                    fevent_manager,
+                    room_id,
+                    fevent_manager.fevent_chunks[room_id],
+                    language_table_sizes[room_id],
                 )
+                for room_id in room_ids
+            ),
+            args.write_threads,
+        )
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+            jobs,
+            initializer=_init_decompile_worker,
+            initargs=(args.profile is not None,),
+        ) as executor:
+            write_decompiled_rooms(
+                _merge_worker_profiles(
+                    executor.map(
+                        _decompile_room_in_worker,
+                        room_ids,
+                        [language_table_sizes[room_id] for room_id in room_ids],
+                        chunksize=max(len(room_ids) // (jobs * 4), 1),
+                    )
+                ),
+                args.write_threads,
+            )
+
+    save_decompile_manifest(fingerprint, room_hashes)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,23 @@
 import collections
+import typing
+
+import mnllib
+
+from .ir import StatementPrinter
 
 
 class DecompilerGlobals:
     next_text_entry_index: collections.defaultdict[int, int] = collections.defaultdict(
         int
     )
+
+    uniform_text_entries: dict[int, tuple[mnllib.LanguageTable, list[bool]]] = {}
+
+    statement_printer: StatementPrinter = StatementPrinter()
+
+    subroutine_bodies: dict[bytes, str] = {}
+    subroutine_bodies_source: tuple[typing.Any, ...] = ()
+
+    fevent_manager: mnllib.FEventScriptManager = typing.cast(
+        mnllib.FEventScriptManager, None
+    )
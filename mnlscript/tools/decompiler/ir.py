@@ -0,0 +1,100 @@
+import typing
+
+
+class Call(typing.NamedTuple):
+    function: str
+    arguments: tuple[str, ...] = ()
+    keyword_arguments: tuple[tuple[str, str], ...] = ()
+
+
+class BinaryOperation(typing.NamedTuple):
+    left: str
+    operator: str
+    right: str
+
+
+class UnaryOperation(typing.NamedTuple):
+    operator: str
+    operand: str
+
+
+Expression: typing.TypeAlias = str | Call | BinaryOperation | UnaryOperation
+
+
+class Assignment(typing.NamedTuple):
+    target: str
+    value: Expression
+
+
+class AugmentedAssignment(typing.NamedTuple):
+    target: str
+    operator: str
+    value: Expression
+
+
+Statement: typing.TypeAlias = Expression | Assignment | AugmentedAssignment
+
+
+class StatementPrinter:
+    fragments: dict[type, dict[typing.Any, str]]
+    max_fragments: int
+
+    def __init__(self, max_fragments: int = 0x10000) -> None:
+        self.fragments = {}
+        self.max_fragments = max_fragments
+
+    def print(self, statements: Statement | list[Statement]) -> str:
+        if isinstance(statements, list):
+            return "\n".join([self.print_statement(x) for x in statements])
+        return self.print_statement(statements)
+
+    def print_statement(self, statement: Statement) -> str:
+        if isinstance(statement, str):
+            return statement
+
+        # Different node types may compare equal as tuples, so the fragments
+        # are kept apart by type.
+        fragments = self.fragments.get(type(statement))
+        if fragments is None:
+            fragments = self.fragments[type(statement)] = {}
+        fragment = fragments.get(statement)
+        if fragment is None:
+            if isinstance(statement, Assignment):
+                fragment = self.print_assignment(statement)
+            elif isinstance(statement, AugmentedAssignment):
+                fragment = self.print_augmented_assignment(statement)
+            else:
+                fragment = self.print_expression(statement)
+            if len(fragments) >= self.max_fragments:
+                fragments.clear()
+            fragments[statement] = fragment
+        return fragment
+
+    def print_expression(self, expression: Expression) -> str:
+        if isinstance(expression, str):
+            return expression
+        if isinstance(expression, Call):
+            return self.print_call(expression)
+        if isinstance(expression, BinaryOperation):
+            return self.print_binary_operation(expression)
+        return self.print_unary_operation(expression)
+
+    def print_call(self, call: Call) -> str:
+        return f"{call.function}({", ".join([
+            *call.arguments,
+            *[f"{name}={value}" for name, value in call.keyword_arguments],
+        ])})"
+
+    def print_binary_operation(self, operation: BinaryOperation) -> str:
+        return f"{operation.left} {operation.operator} {operation.right}"
+
+    def print_unary_operation(self, operation: UnaryOperation) -> str:
+        return f"{operation.operator}{operation.operand}"
+
+    def print_assignment(self, assignment: Assignment) -> str:
+        return f"{assignment.target} = {self.print_expression(assignment.value)}"
+
+    def print_augmented_assignment(self, assignment: AugmentedAssignment) -> str:
+        return f"{assignment.target} {assignment.operator}= {
+            self.print_expression(assignment.value)
+        }"
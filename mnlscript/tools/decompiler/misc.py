@@ -1,4 +1,7 @@
+import codecs
 import enum
+import itertools
+import operator
 import typing
 
 import more_itertools
@@ -6,6 +9,7 @@ import mnllib
 
 from ...text import LANGUAGE_IDS
 from ...utils import fhex
+from .globals import DecompilerGlobals
 
 
 T = typing.TypeVar("T")
@@ -22,8 +26,16 @@ def decompile_enum(
         return unknown_formatter(value)
 
 
+_decompiled_variables: dict[int, str] = {}
+
+
 def decompile_variable(variable: mnllib.Variable) -> str:
-    return f"Variables[{fhex(variable.number, 4)}]"
+    decompiled_variable = _decompiled_variables.get(variable.number)
+    if decompiled_variable is None:
+        decompiled_variable = _decompiled_variables[variable.number] = (
+            f"Variables[{fhex(variable.number, 4)}]"
+        )
+    return decompiled_variable
 
 
 def decompile_const_or_variable(
@@ -43,18 +55,106 @@ def decompile_bool_int_or_variable(
     return decompile_const_or_variable(value, const_formatter=int_formatter)
 
 
-def decompile_text(value: bytes) -> str:
+def decompile_text_with_codec(value: bytes, encoding: str) -> str:
     return (
-        repr(value.decode(mnllib.MNL_ENCODING, errors="backslashreplace"))
+        repr(value.decode(encoding, errors="backslashreplace"))
         .replace("\\\\", "\\")
         .replace("\xff", "\\xff")
     )
 
 
+class TextDecodingTable:
+    characters: str
+    escaped_bytes: bytes
+
+    def __init__(self, characters: str, escaped_bytes: bytes) -> None:
+        self.characters = characters
+        self.escaped_bytes = escaped_bytes
+
+    def decompile_text(self, value: bytes) -> str:
+        text = repr(
+            codecs.charmap_decode(value, "backslashreplace", self.characters)[0]
+        )
+        if any(x in value for x in self.escaped_bytes):
+            text = text.replace("\\\\", "\\").replace("\xff", "\\xff")
+        return text
+
+
+def build_text_decoding_table(encoding: str) -> TextDecodingTable | None:
+    characters: list[str] = []
+    escaped_bytes: list[int] = []
+    for x in range(0x100):
+        try:
+            character = bytes([x]).decode(encoding)
+        except UnicodeDecodeError:
+            # Undefined in a charmap, so decoded with backslashreplace.
+            character = "\ufffe"
+        if len(character) != 1:
+            return None
+        characters.append(character)
+        if character in ("\\", "\xff", "\ufffe"):
+            escaped_bytes.append(x)
+    table = TextDecodingTable("".join(characters), bytes(escaped_bytes))
+
+    # Every pair of bytes has to decode independently for the table to be
+    # equivalent to the codec.
+    byte_pairs = bytes(
+        itertools.chain.from_iterable(itertools.product(range(0x100), repeat=2))
+    )
+    if (
+        byte_pairs.decode(encoding, errors="backslashreplace")
+        != codecs.charmap_decode(byte_pairs, "backslashreplace", table.characters)[0]
+    ):
+        return None
+    return table
+
+
+TEXT_DECODING_TABLE = build_text_decoding_table(mnllib.MNL_ENCODING)
+
+
+def decompile_text(value: bytes) -> str:
+    if TEXT_DECODING_TABLE is not None:
+        return TEXT_DECODING_TABLE.decompile_text(value)
+    return decompile_text_with_codec(value, mnllib.MNL_ENCODING)
+
+
+def get_uniform_text_entries(
+    room_id: int, language_table: mnllib.LanguageTable
+) -> list[bool]:
+    cached = DecompilerGlobals.uniform_text_entries.get(room_id)
+    if cached is not None and cached[0] is language_table:
+        return cached[1]
+
+    text_tables = [
+        typing.cast(mnllib.TextTable, language_table.text_tables[language_id])
+        for language_id in LANGUAGE_IDS.values()
+    ]
+    uniform_text_entries = [True] * len(text_tables[0].entries) if text_tables else []
+    for text_table in text_tables[1:]:
+        uniform_text_entries = [
+            uniform and entry_equal and textbox_size_equal
+            for uniform, entry_equal, textbox_size_equal in zip(
+                uniform_text_entries,
+                map(operator.eq, text_tables[0].entries, text_table.entries),
+                map(
+                    operator.eq,
+                    typing.cast(list[tuple[int, int]], text_tables[0].textbox_sizes),
+                    typing.cast(list[tuple[int, int]], text_table.textbox_sizes),
+                ),
+            )
+        ]
+    DecompilerGlobals.uniform_text_entries[room_id] = (
+        language_table,
+        uniform_text_entries,
+    )
+    return uniform_text_entries
+
+
 def decompile_text_entry(
     language_table: mnllib.LanguageTable,
     text_entry_index: int,
     implicit_text_entry_definition: bool = False,
+    uniform: bool | None = None,
 ) -> str:
     def combined_entries_and_textbox_sizes(
         language_id: int,
@@ -69,9 +169,11 @@ def decompile_text_entry(
             ],
         )
 
-    if more_itertools.all_equal(
-        map(combined_entries_and_textbox_sizes, LANGUAGE_IDS.values())
-    ):
+    if uniform is None:
+        uniform = more_itertools.all_equal(
+            map(combined_entries_and_textbox_sizes, LANGUAGE_IDS.values())
+        )
+    if uniform:
         text_table = typing.cast(
             mnllib.TextTable,
             language_table.text_tables[next(iter(LANGUAGE_IDS.values()))],
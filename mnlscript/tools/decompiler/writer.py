@@ -0,0 +1,112 @@
+import locale
+import os
+import pathlib
+import queue
+import threading
+import types
+import typing
+
+
+class ScriptWriter:
+    parts: list[str]
+
+    def __init__(self) -> None:
+        self.parts = []
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+
+    def write_indented(self, text: str, prefix: str) -> None:
+        # Like `textwrap.indent()`, lines consisting solely of whitespace are
+        # left as they are.
+        for line in text.splitlines(keepends=True):
+            if not line.isspace():
+                self.parts.append(prefix)
+            self.parts.append(line)
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+    def write_to(self, file: typing.TextIO) -> None:
+        file.write(self.getvalue())
+
+
+def write_if_changed(path: pathlib.Path, text: str) -> bool:
+    # Encoded the same way as by `path.open("w")`.
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    data = text.encode(locale.getpreferredencoding(False))
+
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+
+    # Unlike `tempfile`, this creates the file with the usual permissions.
+    temp_path = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        with temp_path.open("xb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return True
+
+
+class BackgroundFileWriter:
+    queue: queue.Queue[tuple[pathlib.Path, str] | None]
+    threads: list[threading.Thread]
+    errors: list[Exception]
+
+    def __init__(self, threads: int = 4, max_pending_files: int = 64) -> None:
+        self.queue = queue.Queue(max_pending_files)
+        self.errors = []
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{type(self).__name__}-{i}")
+            for i in range(threads)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            try:
+                write_if_changed(*item)
+            except Exception as error:
+                self.errors.append(error)
+
+    def write(self, path: pathlib.Path, text: str) -> None:
+        if not self.threads:
+            write_if_changed(path, text)
+            return
+        # Blocks while `max_pending_files` files are waiting to be written.
+        self.queue.put((path, text))
+
+    def close(self, raise_errors: bool = True) -> None:
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if raise_errors and self.errors:
+            raise ExceptionGroup(
+                f"failed to write {len(self.errors)} file(s)", self.errors
+            )
+
+    def __enter__(self) -> typing.Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: types.TracebackType | None,
+    ) -> None:
+        self.close(raise_errors=exc_type is None)
@@ -0,0 +1,24 @@
+import hashlib
+import importlib.metadata
+import pathlib
+
+import mnllib
+
+
+def compute_toolchain_fingerprint() -> str:
+    fingerprint = hashlib.sha256()
+    try:
+        mnllib_version = importlib.metadata.version("mnllib")
+    except importlib.metadata.PackageNotFoundError:
+        mnllib_version = ""
+    fingerprint.update(f"mnllib {mnllib_version}\0".encode())
+    for package_name, package_dir in [
+        ("mnlscript", pathlib.Path(__file__).parents[1]),
+        ("mnllib", pathlib.Path(mnllib.__file__).parent),
+    ]:
+        for path in sorted(package_dir.rglob("*.py")):
+            fingerprint.update(
+                f"{package_name}/{path.relative_to(package_dir).as_posix()}\0".encode()
+            )
+            fingerprint.update(hashlib.sha256(path.read_bytes()).digest())
+    return fingerprint.hexdigest()
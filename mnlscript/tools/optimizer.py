@@ -0,0 +1,274 @@
+import operator
+import struct
+import typing
+
+import mnllib
+
+from ..globals import Globals
+
+
+# Subroutines containing a branch must keep the offsets of all their commands.
+BRANCH_COMMAND_IDS = frozenset([0x0002, 0x0003])
+# Commands the optimizer understands. Any other command might read or write any
+# variable, so it ends the run of commands that are optimized together.
+STRAIGHT_LINE_COMMAND_IDS = frozenset([0x0000, 0x0001, 0x0004, 0x0005, 0x0006]) | (
+    frozenset(range(0x0008, 0x0039))
+)
+TERMINATING_COMMAND_IDS = frozenset([0x0000, 0x0001])
+# Commands whose only effect is writing their result variable.
+PURE_COMMAND_IDS = frozenset(range(0x0008, 0x0039)) - {0x0029}
+# Commands that unconditionally overwrite their result variable.
+WRITING_COMMAND_IDS = frozenset([0x0006]) | frozenset(range(0x0008, 0x0039))
+IN_PLACE_COMMAND_IDS = frozenset(range(0x0016, 0x0022))
+FOLDABLE_OPERATORS: dict[int, typing.Callable[[int, int], int]] = {
+    0x0009: operator.add,
+    0x000A: operator.sub,
+    0x000B: operator.mul,
+    0x0010: operator.and_,
+    0x0011: operator.or_,
+    0x0012: operator.xor,
+}
+
+
+def fits_parameter(
+    manager: mnllib.MnLScriptManager, command_id: int, index: int, value: int
+) -> bool:
+    try:
+        mnllib.COMMAND_PARAMETER_STRUCT_MAP[
+            manager.command_parameter_metadata_table[command_id].parameter_types[index]
+        ].pack(value)
+    except struct.error:
+        return False
+    return True
+
+
+def reads_variable(command: mnllib.Command, variable: mnllib.Variable) -> bool:
+    if (
+        command.command_id in IN_PLACE_COMMAND_IDS
+        and command.result_variable is not None
+        and command.result_variable.number == variable.number
+    ):
+        return True
+    return any(
+        isinstance(argument, mnllib.Variable) and argument.number == variable.number
+        for argument in command.arguments
+    )
+
+
+def addition_delta(command: mnllib.Command) -> int | None:
+    if command.command_id == 0x0016:
+        return 1
+    if command.command_id == 0x0017:
+        return -1
+    if command.command_id in [0x0018, 0x0019] and isinstance(command.arguments[0], int):
+        return (
+            command.arguments[0]
+            if command.command_id == 0x0018
+            else -command.arguments[0]
+        )
+    return None
+
+
+def fold_constants(
+    manager: mnllib.MnLScriptManager, command: mnllib.Command
+) -> mnllib.Command:
+    function = FOLDABLE_OPERATORS.get(command.command_id)
+    if function is None or not all(
+        isinstance(argument, int) for argument in command.arguments
+    ):
+        return command
+    value = function(*command.arguments)
+    if not fits_parameter(manager, 0x0008, 0, value):
+        return command
+    return mnllib.Command(0x0008, [value], command.result_variable)
+
+
+def merge_commands(
+    manager: mnllib.MnLScriptManager,
+    previous: mnllib.Command,
+    command: mnllib.Command,
+) -> list[mnllib.Command] | None:
+    delta = addition_delta(command)
+    if (
+        delta is None
+        or previous.result_variable is None
+        or command.result_variable is None
+        or previous.result_variable.number != command.result_variable.number
+    ):
+        return None
+
+    if previous.command_id == 0x0008 and isinstance(previous.arguments[0], int):
+        value = previous.arguments[0] + delta
+        if not fits_parameter(manager, 0x0008, 0, value):
+            return None
+        return [mnllib.Command(0x0008, [value], previous.result_variable)]
+
+    previous_delta = addition_delta(previous)
+    if previous_delta is None:
+        return None
+    delta += previous_delta
+    if delta == 0:
+        return []
+    if delta == 1:
+        return [mnllib.Command(0x0016, [], previous.result_variable)]
+    if delta == -1:
+        return [mnllib.Command(0x0017, [], previous.result_variable)]
+    if not fits_parameter(manager, 0x0018, 0, delta):
+        return None
+    return [mnllib.Command(0x0018, [delta], previous.result_variable)]
+
+
+def is_dead_store(previous: mnllib.Command, command: mnllib.Command) -> bool:
+    return (
+        previous.command_id in PURE_COMMAND_IDS
+        and command.command_id in WRITING_COMMAND_IDS
+        and previous.result_variable is not None
+        and command.result_variable is not None
+        and previous.result_variable.number == command.result_variable.number
+        and not reads_variable(command, command.result_variable)
+    )
+
+
+def optimize_subroutine(
+    manager: mnllib.MnLScriptManager, subroutine: mnllib.Subroutine
+) -> int:
+    if any(command.command_id in BRANCH_COMMAND_IDS for command in subroutine.commands):
+        return 0
+
+    optimized: list[mnllib.Command] = []
+    run_start = 0
+    for command in subroutine.commands:
+        if command.command_id not in STRAIGHT_LINE_COMMAND_IDS:
+            optimized.append(command)
+            run_start = len(optimized)
+            continue
+
+        pending: mnllib.Command | None = fold_constants(manager, command)
+        while len(optimized) > run_start and pending is not None:
+            merged = merge_commands(manager, optimized[-1], pending)
+            if merged is None:
+                break
+            optimized.pop()
+            pending = merged[0] if merged else None
+        if pending is None:
+            continue
+
+        while len(optimized) > run_start and is_dead_store(optimized[-1], pending):
+            optimized.pop()
+        optimized.append(pending)
+        if pending.command_id in TERMINATING_COMMAND_IDS:
+            break
+
+    removed_commands = len(subroutine.commands) - len(optimized)
+    subroutine.commands = optimized
+    return removed_commands
+
+
+def optimize_script(
+    manager: mnllib.MnLScriptManager, script: mnllib.FEventScript
+) -> int:
+    return optimize_subroutine(manager, script.header.post_table_subroutine) + sum(
+        optimize_subroutine(manager, subroutine) for subroutine in script.subroutines
+    )
+
+
+def subroutine_key(subroutine: mnllib.Subroutine) -> typing.Hashable | None:
+    key = (
+        subroutine.footer,
+        *(
+            (
+                command.command_id,
+                *(
+                    (
+                        (argument.number,)
+                        if isinstance(argument, mnllib.Variable)
+                        else argument
+                    )
+                    for argument in command.arguments
+                ),
+                (
+                    command.result_variable.number
+                    if command.result_variable is not None
+                    else None
+                ),
+            )
+            for command in subroutine.commands
+        ),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def script_subroutines(script: mnllib.FEventScript) -> list[mnllib.Subroutine]:
+    return [script.header.post_table_subroutine, *script.subroutines]
+
+
+def find_subroutine_calls(
+    script: mnllib.FEventScript,
+) -> list[tuple[mnllib.Command, int]] | None:
+    calls: list[tuple[mnllib.Command, int]] = []
+    for subroutine in script_subroutines(script):
+        for command in subroutine.commands:
+            argument_index = Globals.subroutine_call_commands.get(command.command_id)
+            if argument_index is None:
+                continue
+            if not isinstance(command.arguments[argument_index], int):
+                return None
+            calls.append((command, argument_index))
+    return calls
+
+
+def deduplicate_subroutines(
+    manager: mnllib.MnLScriptManager, script: mnllib.FEventScript
+) -> int:
+    if not Globals.subroutine_call_commands:
+        return 0
+    calls = find_subroutine_calls(script)
+    if calls is None:
+        return 0
+
+    while True:
+        canonical_indices: dict[typing.Hashable, int] = {}
+        replacements: dict[int, int] = {}
+        for index, subroutine in enumerate(script.subroutines):
+            key = subroutine_key(subroutine)
+            if key is None:
+                continue
+            canonical_index = canonical_indices.setdefault(key, index)
+            if canonical_index != index:
+                replacements[index] = canonical_index
+
+        rewritten = False
+        for command, argument_index in calls:
+            replacement = replacements.get(command.arguments[argument_index])
+            if replacement is not None:
+                command.arguments[argument_index] = replacement
+                rewritten = True
+        if not rewritten:
+            break
+
+    if Globals.map_header_subroutine_indices is None or not replacements:
+        return 0
+    original_size = len(script.to_bytes(manager))
+
+    # Copies are renumbered to their first copy, which comes before them.
+    new_indices: dict[int, int] = {}
+    kept_subroutines: list[mnllib.Subroutine] = []
+    for index, subroutine in enumerate(script.subroutines):
+        if index in replacements:
+            new_indices[index] = new_indices[replacements[index]]
+        else:
+            new_indices[index] = len(kept_subroutines)
+            kept_subroutines.append(subroutine)
+    for command, argument_index in calls:
+        command.arguments[argument_index] = new_indices.get(
+            command.arguments[argument_index], command.arguments[argument_index]
+        )
+    Globals.map_header_subroutine_indices(
+        script.header, lambda index: new_indices.get(index, index)
+    )
+    script.subroutines[:] = kept_subroutines
+    return original_size - len(script.to_bytes(manager))
@@ -0,0 +1,160 @@
+import atexit
+import collections
+import contextlib
+import json
+import pathlib
+import sys
+import time
+import typing
+
+from ..utils import fhex
+
+
+class MatcherStats:
+    attempts: int
+    matches: int
+    hits: int
+    time: float
+
+    def __init__(
+        self, attempts: int = 0, matches: int = 0, hits: int = 0, time: float = 0.0
+    ) -> None:
+        self.attempts = attempts
+        self.matches = matches
+        self.hits = hits
+        self.time = time
+
+
+class Profiler:
+    matcher_stats: collections.defaultdict[str, MatcherStats]
+    room_times: collections.defaultdict[str, collections.defaultdict[int, float]]
+
+    def __init__(self) -> None:
+        self.matcher_stats = collections.defaultdict(MatcherStats)
+        self.room_times = collections.defaultdict(
+            lambda: collections.defaultdict(float)
+        )
+
+    def record_match(
+        self,
+        matcher_names: typing.Sequence[str],
+        matcher_index: int,
+        hit: bool,
+        elapsed: float,
+    ) -> None:
+        for name in matcher_names[: matcher_index + 1]:
+            self.matcher_stats[name].attempts += 1
+        stats = self.matcher_stats[matcher_names[matcher_index]]
+        stats.matches += 1
+        if hit:
+            stats.hits += 1
+        stats.time += elapsed
+
+    def record_cache_lookup(self, name: str, hit: bool, elapsed: float) -> None:
+        stats = self.matcher_stats[name]
+        stats.attempts += 1
+        if hit:
+            stats.matches += 1
+            stats.hits += 1
+        stats.time += elapsed
+
+    def record_room(self, category: str, room_id: int, elapsed: float) -> None:
+        self.room_times[category][room_id] += elapsed
+
+    def to_json(self) -> dict[str, typing.Any]:
+        return {
+            "matchers": {
+                name: vars(stats)
+                for name, stats in sorted(
+                    self.matcher_stats.items(), key=lambda x: x[1].time, reverse=True
+                )
+            },
+            "rooms": {
+                category: {
+                    fhex(room_id, 4): elapsed
+                    for room_id, elapsed in sorted(
+                        times.items(), key=lambda x: x[1], reverse=True
+                    )
+                }
+                for category, times in self.room_times.items()
+            },
+        }
+
+    def merge_json(self, data: dict[str, typing.Any]) -> None:
+        for name, stats in data["matchers"].items():
+            own_stats = self.matcher_stats[name]
+            own_stats.attempts += stats["attempts"]
+            own_stats.matches += stats["matches"]
+            own_stats.hits += stats["hits"]
+            own_stats.time += stats["time"]
+        for category, times in data["rooms"].items():
+            for room_id, elapsed in times.items():
+                self.room_times[category][int(room_id, base=16)] += elapsed
+
+    def format_report(self, max_rooms: int = 20) -> str:
+        lines: list[str] = []
+        if self.matcher_stats:
+            lines.append(
+                f"{"matcher":<48} {"attempts":>10} {"matches":>10} {"hits":>10} "
+                f"{"time (ms)":>10} {"avg (us)":>10}"
+            )
+            for name, stats in sorted(
+                self.matcher_stats.items(), key=lambda x: x[1].time, reverse=True
+            ):
+                average_time = stats.time / stats.matches if stats.matches else 0
+                lines.append(
+                    f"{name[:48]:<48} {stats.attempts:>10} {stats.matches:>10} "
+                    f"{stats.hits:>10} {stats.time * 1e3:>10.2f} "
+                    f"{average_time * 1e6:>10.2f}"
+                )
+        for category, times in self.room_times.items():
+            if lines:
+                lines.append("")
+            lines.append(f"{category:<48} {"time (ms)":>10}")
+            for room_id, elapsed in sorted(
+                times.items(), key=lambda x: x[1], reverse=True
+            )[:max_rooms]:
+                room_name = f"room {fhex(room_id, 4)}"
+                lines.append(f"{room_name:<48} {elapsed * 1e3:>10.2f}")
+        return "\n".join(lines)
+
+    def take(self) -> dict[str, typing.Any]:
+        data = self.to_json()
+        self.matcher_stats.clear()
+        self.room_times.clear()
+        return data
+
+
+class ProfilingGlobals:
+    profiler: Profiler | None = None
+
+
+def enable_profiling(json_path: pathlib.Path | None = None) -> Profiler:
+    profiler = Profiler()
+    ProfilingGlobals.profiler = profiler
+
+    if json_path is not None:
+
+        def dump_report() -> None:
+            print(profiler.format_report(), file=sys.stderr)
+            with json_path.open("w") as file:
+                json.dump(profiler.to_json(), file, indent=2)
+                file.write("\n")
+
+        atexit.register(dump_report)
+
+    return profiler
+
+
+@contextlib.contextmanager
+def profile_room(category: str, room_id: int) -> typing.Iterator[None]:
+    profiler = ProfilingGlobals.profiler
+    if profiler is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_room(category, room_id, time.perf_counter() - start)
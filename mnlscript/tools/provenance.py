@@ -0,0 +1,125 @@
+import atexit
+import collections
+import json
+import pathlib
+import sys
+import types
+import typing
+
+import mnllib
+
+from ..globals import Globals
+from ..utils import MNLSCRIPT_PACKAGE_DIRECTORY
+
+
+class CommandStats:
+    commands: int
+    size: int
+
+    def __init__(self, commands: int = 0, size: int = 0) -> None:
+        self.commands = commands
+        self.size = size
+
+
+class ProvenanceRecorder:
+    line_stats: collections.defaultdict[str, CommandStats]
+    function_stats: collections.defaultdict[str, CommandStats]
+
+    def __init__(self) -> None:
+        self.line_stats = collections.defaultdict(CommandStats)
+        self.function_stats = collections.defaultdict(CommandStats)
+
+    def record(self, command: mnllib.Command) -> None:
+        # Only the frames of mnlscript's own helpers are skipped, which are
+        # just a handful between the script and `emit_command`.
+        frame: types.FrameType | None = sys._getframe(1)
+        while frame is not None and frame.f_code.co_filename.startswith(
+            MNLSCRIPT_PACKAGE_DIRECTORY
+        ):
+            frame = frame.f_back
+        size = len(mnllib.Subroutine([command]).to_bytes(Globals.fevent_manager))
+
+        if frame is not None:
+            stats = self.line_stats[f"{frame.f_code.co_filename}:{frame.f_lineno}"]
+            stats.commands += 1
+            stats.size += size
+
+        function = Globals.current_subroutine_function.get()
+        if function is not None:
+            code = function.__code__
+            stats = self.function_stats[
+                f"{code.co_filename}:{code.co_firstlineno} {function.__qualname__}"
+            ]
+            stats.commands += 1
+            stats.size += size
+
+    def to_json(self) -> dict[str, typing.Any]:
+        return {
+            "lines": {
+                location: vars(stats)
+                for location, stats in sorted(
+                    self.line_stats.items(), key=lambda x: x[1].size, reverse=True
+                )
+            },
+            "functions": {
+                name: vars(stats)
+                for name, stats in sorted(
+                    self.function_stats.items(),
+                    key=lambda x: x[1].size,
+                    reverse=True,
+                )
+            },
+        }
+
+    def merge_json(self, data: dict[str, typing.Any]) -> None:
+        for category, all_stats in [
+            ("lines", self.line_stats),
+            ("functions", self.function_stats),
+        ]:
+            for name, stats in data[category].items():
+                own_stats = all_stats[name]
+                own_stats.commands += stats["commands"]
+                own_stats.size += stats["size"]
+
+    def format_report(self, max_entries: int = 20) -> str:
+        lines: list[str] = []
+        for category, all_stats in [
+            ("source line", self.line_stats),
+            ("subroutine", self.function_stats),
+        ]:
+            if lines:
+                lines.append("")
+            lines.append(f"{category:<64} {"commands":>10} {"bytes":>10}")
+            for name, stats in sorted(
+                all_stats.items(), key=lambda x: x[1].size, reverse=True
+            )[:max_entries]:
+                lines.append(f"{name[-64:]:<64} {stats.commands:>10} {stats.size:>10}")
+        return "\n".join(lines)
+
+    def take(self) -> dict[str, typing.Any]:
+        data = self.to_json()
+        self.line_stats.clear()
+        self.function_stats.clear()
+        return data
+
+
+class ProvenanceGlobals:
+    recorder: ProvenanceRecorder | None = None
+
+
+def enable_provenance(json_path: pathlib.Path | None = None) -> ProvenanceRecorder:
+    recorder = ProvenanceRecorder()
+    ProvenanceGlobals.recorder = recorder
+    Globals.command_recorder = recorder.record
+
+    if json_path is not None:
+
+        def dump_report() -> None:
+            print(recorder.format_report(), file=sys.stderr)
+            with json_path.open("w") as file:
+                json.dump(recorder.to_json(), file, indent=2)
+                file.write("\n")
+
+        atexit.register(dump_report)
+
+    return recorder
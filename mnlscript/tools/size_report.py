@@ -0,0 +1,128 @@
+import json
+import pathlib
+import typing
+
+import mnllib
+
+from ..consts import PADDING_TEXT_TABLE_ID
+from ..utils import fhex
+
+
+def measure_script(
+    manager: mnllib.MnLScriptManager, script: mnllib.FEventScript
+) -> dict[str, typing.Any]:
+    subroutines = {
+        "post_table": len(script.header.post_table_subroutine.to_bytes(manager))
+    }
+    for index, subroutine in enumerate(script.subroutines):
+        subroutines[str(index)] = len(subroutine.to_bytes(manager))
+    return {"size": len(script.to_bytes(manager)), "subroutines": subroutines}
+
+
+def measure_language_table(
+    manager: mnllib.MnLScriptManager, language_table: mnllib.LanguageTable
+) -> dict[str, typing.Any]:
+    padding = (
+        language_table.text_tables[PADDING_TEXT_TABLE_ID]
+        if len(language_table.text_tables) > PADDING_TEXT_TABLE_ID
+        else None
+    )
+    return {
+        "size": len(language_table.to_bytes(manager)),
+        "padding": len(padding) if isinstance(padding, bytes) else 0,
+    }
+
+
+def measure_room(
+    manager: mnllib.FEventScriptManager, room_id: int
+) -> dict[str, typing.Any]:
+    scripts: dict[str, typing.Any] = {}
+    language_table: dict[str, typing.Any] | None = None
+    for triple_index, chunk in enumerate(manager.fevent_chunks[room_id]):
+        if isinstance(chunk, mnllib.FEventScript):
+            scripts[str(triple_index)] = measure_script(manager, chunk)
+        elif isinstance(chunk, mnllib.LanguageTable):
+            language_table = measure_language_table(manager, chunk)
+    return {
+        "size": sum(script["size"] for script in scripts.values())
+        + (language_table["size"] if language_table is not None else 0),
+        "scripts": scripts,
+        "language_table": language_table,
+    }
+
+
+def build_size_report(
+    manager: mnllib.FEventScriptManager, room_ids: typing.Iterable[int]
+) -> dict[str, typing.Any]:
+    rooms = {fhex(room_id, 4): measure_room(manager, room_id) for room_id in room_ids}
+    return {
+        "size": sum(room["size"] for room in rooms.values()),
+        "rooms": rooms,
+    }
+
+
+def load_size_report(path: pathlib.Path) -> dict[str, typing.Any] | None:
+    try:
+        with path.open() as file:
+            report = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return report if isinstance(report, dict) else None
+
+
+def format_size(size: int, previous: typing.Any) -> str:
+    if not isinstance(previous, dict) or not isinstance(previous.get("size"), int):
+        return f"{size:>10} {"new":>10}"
+    delta = size - previous["size"]
+    return f"{size:>10} {f"{delta:+}" if delta != 0 else "":>10}"
+
+
+def format_size_report(
+    report: dict[str, typing.Any], previous_report: dict[str, typing.Any] | None
+) -> str:
+    previous_rooms = (previous_report or {}).get("rooms", {})
+    lines = [f"{"chunk":<48} {"bytes":>10} {"delta":>10}"]
+    for room_name, room in report["rooms"].items():
+        previous_room = previous_rooms.get(room_name, {})
+        lines.append(
+            f"{f"room {room_name}":<48} {format_size(room["size"], previous_room)}"
+        )
+        previous_scripts = previous_room.get("scripts", {})
+        for triple_index, script in room["scripts"].items():
+            previous_script = previous_scripts.get(triple_index, {})
+            lines.append(
+                f"{f"  script {triple_index}":<48} "
+                f"{format_size(script["size"], previous_script)}"
+            )
+            previous_subroutines = previous_script.get("subroutines", {})
+            for index, size in script["subroutines"].items():
+                previous_size = previous_subroutines.get(index)
+                lines.append(
+                    f"{f"    sub_{index}":<48} "
+                    + format_size(
+                        size,
+                        {"size": previous_size} if previous_size is not None else None,
+                    )
+                )
+        language_table = room["language_table"]
+        if language_table is not None:
+            lines.append(
+                f"{f"  language table ({language_table["padding"]} padding)":<48} "
+                f"{format_size(
+                    language_table["size"], previous_room.get("language_table")
+                )}"
+            )
+    lines.append(f"{"total":<48} {format_size(report["size"], previous_report)}")
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def write_size_report(
+    manager: mnllib.FEventScriptManager,
+    room_ids: typing.Iterable[int],
+    json_path: pathlib.Path,
+) -> None:
+    report = build_size_report(manager, room_ids)
+    print(format_size_report(report, load_size_report(json_path)))
+    with json_path.open("w") as file:
+        json.dump(report, file, indent=2)
+        file.write("\n")
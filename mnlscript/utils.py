@@ -1,26 +1,58 @@
+import collections
 import functools
+import inspect
+import os
+import sys
 import types
 import typing
 
+from .globals import Globals
+
 
 T = typing.TypeVar("T")
 P = typing.ParamSpec("P")
 
 
+MNLSCRIPT_PACKAGE_DIRECTORY = os.path.dirname(__file__) + os.sep
+
+FHEX_CACHE_LIMIT = 0x10000
+_fhex_caches: collections.defaultdict[int, dict[int, str]] = collections.defaultdict(
+    dict
+)
+_fhex_byte_cache = _fhex_caches[2]
+_fhex_short_cache = _fhex_caches[4]
+_fhex_int_cache = _fhex_caches[8]
+
+
 def fhex(num: int, width: int = 0) -> str:
-    return f"{"-" if num < 0 else ""}0x{abs(num):0{width}X}"
+    cache = _fhex_caches[width]
+    string = cache.get(num)
+    if string is None:
+        string = f"{"-" if num < 0 else ""}0x{abs(num):0{width}X}"
+        if 0 <= num < FHEX_CACHE_LIMIT:
+            cache[num] = string
+    return string
 
 
 def fhex_byte(num: int) -> str:
-    return fhex(num, 2)
+    string = _fhex_byte_cache.get(num)
+    if string is None:
+        return fhex(num, 2)
+    return string
 
 
 def fhex_short(num: int) -> str:
-    return fhex(num, 4)
+    string = _fhex_short_cache.get(num)
+    if string is None:
+        return fhex(num, 4)
+    return string
 
 
 def fhex_int(num: int) -> str:
-    return fhex(num, 8)
+    string = _fhex_int_cache.get(num)
+    if string is None:
+        return fhex(num, 8)
+    return string
 
 
 def arg_isinstance_or_not_implemented(
@@ -43,3 +75,29 @@ def arg_isinstance_or_not_implemented(
         return wrapper
 
     return decorator
+
+
+def caller_local(name: str, local_type: type[T]) -> T | None:
+    # The callers are searched from the innermost one outwards, but only up to the
+    # subroutine being defined, whose own locals end the search anyway; everything
+    # further out is covered by the context variables.
+    function = Globals.current_subroutine_function.get()
+    stop_code = getattr(function, "__code__", None)
+    frame: types.FrameType | None = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if not code.co_filename.startswith(MNLSCRIPT_PACKAGE_DIRECTORY):
+            # Building `f_locals` for a function frame is much slower than checking
+            # whether the function has such a local at all.
+            if not code.co_flags & inspect.CO_OPTIMIZED or (
+                name in code.co_varnames
+                or name in code.co_cellvars
+                or name in code.co_freevars
+            ):
+                value = frame.f_locals.get(name)
+                if isinstance(value, local_type):
+                    return value
+            if code is stop_code:
+                return None
+        frame = frame.f_back
+    return None
@@ -31,33 +31,283 @@ from .commands import (
     subtract,
     subtract_in_place,
 )
+from .globals import Globals
 
 
 T = typing.TypeVar("T")
 P = typing.ParamSpec("P")
 
 
+Operand: typing.TypeAlias = "int | mnllib.Variable | Operation"
+OperationResult: typing.TypeAlias = "Operation | types.NotImplementedType"
+
+
 class Operation:
-    command_function: typing.Callable[
-        [mnllib.Variable, mnllib.Subroutine | None], typing.Any
-    ]
+    command_function: (
+        typing.Callable[[mnllib.Variable, mnllib.Subroutine | None], typing.Any] | None
+    )
+    operator: str | None
+    operands: tuple[Operand, ...]
 
     def __init__(
         self,
-        command_function: typing.Callable[
-            [mnllib.Variable, mnllib.Subroutine | None], typing.Any
-        ],
+        command_function: (
+            typing.Callable[[mnllib.Variable, mnllib.Subroutine | None], typing.Any]
+            | None
+        ),
+        operator: str | None = None,
+        operands: tuple[Operand, ...] = (),
     ) -> None:
         self.command_function = command_function
+        self.operator = operator
+        self.operands = operands
 
     def apply(
         self, res: mnllib.Variable, *, subroutine: mnllib.Subroutine | None = None
     ) -> None:
-        self.command_function(res, subroutine)
+        if self.command_function is not None:
+            self.command_function(res, subroutine)
+        else:
+            lowering = ExpressionLowering(self, res, subroutine=subroutine)
+            lowering.lower(self, res)
+            lowering.emit_commands()
+
+    def __add__(self, other: Operand) -> OperationResult:
+        return expression_operation("+", self, other)
+
+    def __radd__(self, other: Operand) -> OperationResult:
+        return expression_operation("+", other, self)
+
+    def __sub__(self, other: Operand) -> OperationResult:
+        return expression_operation("-", self, other)
+
+    def __rsub__(self, other: Operand) -> OperationResult:
+        return expression_operation("-", other, self)
+
+    def __mul__(self, other: Operand) -> OperationResult:
+        return expression_operation("*", self, other)
+
+    def __rmul__(self, other: Operand) -> OperationResult:
+        return expression_operation("*", other, self)
+
+    def __floordiv__(self, other: Operand) -> OperationResult:
+        return expression_operation("//", self, other)
+
+    def __rfloordiv__(self, other: Operand) -> OperationResult:
+        return expression_operation("//", other, self)
+
+    def __mod__(self, other: Operand) -> OperationResult:
+        return expression_operation("%", self, other)
+
+    def __rmod__(self, other: Operand) -> OperationResult:
+        return expression_operation("%", other, self)
+
+    def __lshift__(self, other: Operand) -> OperationResult:
+        return expression_operation("<<", self, other)
+
+    def __rlshift__(self, other: Operand) -> OperationResult:
+        return expression_operation("<<", other, self)
+
+    def __rshift__(self, other: Operand) -> OperationResult:
+        return expression_operation(">>", self, other)
+
+    def __rrshift__(self, other: Operand) -> OperationResult:
+        return expression_operation(">>", other, self)
+
+    def __and__(self, other: Operand) -> OperationResult:
+        return expression_operation("&", self, other)
+
+    def __rand__(self, other: Operand) -> OperationResult:
+        return expression_operation("&", other, self)
+
+    def __xor__(self, other: Operand) -> OperationResult:
+        return expression_operation("^", self, other)
+
+    def __rxor__(self, other: Operand) -> OperationResult:
+        return expression_operation("^", other, self)
+
+    def __or__(self, other: Operand) -> OperationResult:
+        return expression_operation("|", self, other)
+
+    def __ror__(self, other: Operand) -> OperationResult:
+        return expression_operation("|", other, self)
+
+    def __neg__(self) -> OperationResult:
+        return expression_operation("-", self)
+
+    def __invert__(self) -> OperationResult:
+        return expression_operation("~", self)
+
+
+class BinaryOperator(typing.NamedTuple):
+    command_function: typing.Callable[..., typing.Any]
+    in_place_command_function: typing.Callable[..., typing.Any]
+    commutative: bool
+
+
+BINARY_OPERATORS: dict[str, BinaryOperator] = {
+    "+": BinaryOperator(add, add_in_place, True),
+    "-": BinaryOperator(subtract, subtract_in_place, False),
+    "*": BinaryOperator(multiply, multiply_in_place, True),
+    "//": BinaryOperator(divide, divide_in_place, False),
+    "%": BinaryOperator(modulo, modulo_in_place, False),
+    "<<": BinaryOperator(logical_shift_left, logical_shift_left_in_place, False),
+    ">>": BinaryOperator(logical_shift_right, logical_shift_right_in_place, False),
+    "&": BinaryOperator(bitwise_and, bitwise_and_in_place, True),
+    "^": BinaryOperator(bitwise_xor, bitwise_xor_in_place, True),
+    "|": BinaryOperator(bitwise_or, bitwise_or_in_place, True),
+}
+UNARY_OPERATORS: dict[str, typing.Callable[..., typing.Any]] = {
+    "-": negate,
+    "~": bitwise_not,
+}
+
+
+def references_variable(operand: Operand, number: int) -> bool:
+    if isinstance(operand, Operation):
+        return any(references_variable(child, number) for child in operand.operands)
+    return isinstance(operand, mnllib.Variable) and operand.number == number
+
+
+def expression_operation(operator: str, *operands: Operand) -> OperationResult:
+    for operand in operands:
+        if not isinstance(operand, (int, mnllib.Variable, Operation)):
+            return NotImplemented
+
+    return Operation(None, operator, operands)
+
+
+class ExpressionLowering:
+    subroutine: mnllib.Subroutine | None
+    available_scratch_variables: list[int]
+    commands: list[typing.Callable[[], typing.Any]]
+
+    def __init__(
+        self,
+        operation: Operation,
+        res: mnllib.Variable,
+        *,
+        subroutine: mnllib.Subroutine | None = None,
+    ) -> None:
+        self.subroutine = subroutine
+        self.available_scratch_variables = [
+            number
+            for number in Globals.scratch_variables
+            if number != res.number and not references_variable(operation, number)
+        ]
+        self.commands = []
+
+    def add_command(
+        self, command_function: typing.Callable[..., typing.Any], *args: object
+    ) -> None:
+        self.commands.append(
+            functools.partial(command_function, *args, subroutine=self.subroutine)
+        )
+
+    def emit_commands(self) -> None:
+        for command in self.commands:
+            command()
+
+    def allocate(self) -> "Variable":
+        if not self.available_scratch_variables:
+            raise ValueError(
+                "expression needs a temporary variable, but no scratch variables "
+                "are available (see `Globals.scratch_variables`)"
+            )
+        return Variable(self.available_scratch_variables.pop(0))
+
+    def release(self, variable: mnllib.Variable | None) -> None:
+        if variable is not None:
+            self.available_scratch_variables.insert(0, variable.number)
+
+    def materialize(
+        self, operand: Operand
+    ) -> tuple[int | mnllib.Variable, mnllib.Variable | None]:
+        if not isinstance(operand, Operation):
+            return operand, None
+        temporary = self.allocate()
+        self.lower(operand, temporary)
+        return temporary, temporary
+
+    def lower_in_place(
+        self, operator: str, operand: Operand, res: mnllib.Variable
+    ) -> None:
+        value, temporary = self.materialize(operand)
+        if operator in ["+", "-"] and isinstance(value, int) and value in [1, -1]:
+            if (value == 1) == (operator == "+"):
+                self.add_command(increment, res)
+            else:
+                self.add_command(decrement, res)
+        else:
+            self.add_command(
+                BINARY_OPERATORS[operator].in_place_command_function, value, res
+            )
+        self.release(temporary)
+
+    def lower(self, operand: Operand, res: mnllib.Variable) -> None:
+        if not isinstance(operand, Operation):
+            if not isinstance(operand, mnllib.Variable) or operand.number != res.number:
+                self.add_command(set_variable, operand, res)
+            return
+        if operand.command_function is not None:
+            self.commands.append(
+                functools.partial(operand.command_function, res, self.subroutine)
+            )
+            return
+        operator = typing.cast(str, operand.operator)
+
+        if len(operand.operands) == 1:
+            self.lower(operand.operands[0], res)
+            self.add_command(UNARY_OPERATORS[operator], res, res)
+            return
+
+        left, right = operand.operands
+        binary_operator = BINARY_OPERATORS[operator]
+        if binary_operator.commutative and (
+            (
+                not isinstance(right, Operation)
+                and references_variable(right, res.number)
+            )
+            or (
+                not isinstance(left, Operation)
+                and not references_variable(left, res.number)
+                and isinstance(right, Operation)
+            )
+        ):
+            left, right = right, left
+
+        if not isinstance(left, Operation) and references_variable(left, res.number):
+            self.lower_in_place(operator, right, res)
+            return
+
+        if isinstance(left, Operation) and not references_variable(right, res.number):
+            self.lower(left, res)
+            self.lower_in_place(operator, right, res)
+            return
+
+        if isinstance(right, Operation) and not references_variable(left, res.number):
+            if binary_operator.commutative:
+                self.lower(right, res)
+                self.lower_in_place(operator, left, res)
+                return
+            left_value, left_temporary = self.materialize(left)
+            self.lower(right, res)
+            self.add_command(binary_operator.command_function, left_value, res, res)
+            self.release(left_temporary)
+            return
+
+        left_value, left_temporary = self.materialize(left)
+        right_value, right_temporary = self.materialize(right)
+        self.add_command(binary_operator.command_function, left_value, right_value, res)
+        self.release(right_temporary)
+        self.release(left_temporary)
 
 
 def single_command_operation(
-    command_function: typing.Callable[..., typing.Any], reverse: bool = False
+    command_function: typing.Callable[..., typing.Any],
+    reverse: bool = False,
+    *,
+    operator: str | None = None,
 ) -> typing.Callable[
     [typing.Callable[P, Operation | types.NotImplementedType | None]],
     typing.Callable[P, Operation | types.NotImplementedType],
@@ -77,15 +327,17 @@ def single_command_operation(
                 if not isinstance(arg, (int, mnllib.Variable)):
                     return NotImplemented
 
-            if reverse:
-                real_args: typing.Iterator[object] | tuple[object, ...] = reversed(args)
-            else:
-                real_args = args
+            real_args = typing.cast(
+                tuple[int | mnllib.Variable, ...],
+                tuple(reversed(args)) if reverse else args,
+            )
 
             return Operation(
                 lambda res, subroutine: command_function(
                     *real_args, res, subroutine=subroutine, **kwargs
-                )
+                ),
+                operator,
+                real_args,
             )
 
         return wrapper
@@ -94,7 +346,9 @@ def single_command_operation(
 
 
 def in_place_single_command_operation(
-    command_function: typing.Callable[..., typing.Any]
+    command_function: typing.Callable[..., typing.Any],
+    *,
+    operator: str | None = None,
 ) -> typing.Callable[
     [typing.Callable[typing.Concatenate[T, P], bool | None]],
     typing.Callable[typing.Concatenate[T, P], T | types.NotImplementedType],
@@ -110,9 +364,17 @@ def in_place_single_command_operation(
                 return res
 
             for arg in args:
-                if not isinstance(arg, (int, mnllib.Variable)):
+                if isinstance(arg, (int, mnllib.Variable)):
+                    continue
+                if operator is None or not isinstance(arg, Operation):
                     return NotImplemented
 
+                variable = typing.cast(mnllib.Variable, res)
+                Operation(
+                    None, operator, (variable, *typing.cast(tuple[Operand, ...], args))
+                ).apply(variable, **kwargs)
+                return res
+
             command_function(*args, res, **kwargs)
 
             return res
@@ -134,15 +396,15 @@ class Variable(mnllib.Variable):
         else:
             super().__init__(arg)
 
-    @single_command_operation(add)
+    @single_command_operation(add, operator="+")
     def __add__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(add, reverse=True)
+    @single_command_operation(add, reverse=True, operator="+")
     def __radd__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(add_in_place)
+    @in_place_single_command_operation(add_in_place, operator="+")
     def __iadd__(self, other: int | mnllib.Variable) -> bool:
         if other == 1:
             increment(self)
@@ -152,15 +414,15 @@ class Variable(mnllib.Variable):
             return True
         return False
 
-    @single_command_operation(subtract)
+    @single_command_operation(subtract, operator="-")
     def __sub__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(subtract, reverse=True)
+    @single_command_operation(subtract, reverse=True, operator="-")
     def __rsub__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(subtract_in_place)
+    @in_place_single_command_operation(subtract_in_place, operator="-")
     def __isub__(self, other: int | mnllib.Variable) -> bool:
         if other == 1:
             decrement(self)
@@ -170,107 +432,107 @@ class Variable(mnllib.Variable):
             return True
         return False
 
-    @single_command_operation(multiply)
+    @single_command_operation(multiply, operator="*")
     def __mul__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(multiply, reverse=True)
+    @single_command_operation(multiply, reverse=True, operator="*")
     def __rmul__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(multiply_in_place)
+    @in_place_single_command_operation(multiply_in_place, operator="*")
     def __imul__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(divide)
+    @single_command_operation(divide, operator="//")
     def __floordiv__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(divide, reverse=True)
+    @single_command_operation(divide, reverse=True, operator="//")
     def __rfloordiv__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(divide_in_place)
+    @in_place_single_command_operation(divide_in_place, operator="//")
     def __ifloordiv__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(modulo)
+    @single_command_operation(modulo, operator="%")
     def __mod__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(modulo, reverse=True)
+    @single_command_operation(modulo, reverse=True, operator="%")
     def __rmod__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(modulo_in_place)
+    @in_place_single_command_operation(modulo_in_place, operator="%")
     def __imod__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(logical_shift_left)
+    @single_command_operation(logical_shift_left, operator="<<")
     def __lshift__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(logical_shift_left, reverse=True)
+    @single_command_operation(logical_shift_left, reverse=True, operator="<<")
     def __rlshift__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(logical_shift_left_in_place)
+    @in_place_single_command_operation(logical_shift_left_in_place, operator="<<")
     def __ilshift__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(logical_shift_right)
+    @single_command_operation(logical_shift_right, operator=">>")
     def __rshift__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(logical_shift_right, reverse=True)
+    @single_command_operation(logical_shift_right, reverse=True, operator=">>")
     def __rrshift__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(logical_shift_right_in_place)
+    @in_place_single_command_operation(logical_shift_right_in_place, operator=">>")
     def __irshift__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(bitwise_and)
+    @single_command_operation(bitwise_and, operator="&")
     def __and__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(bitwise_and, reverse=True)
+    @single_command_operation(bitwise_and, reverse=True, operator="&")
     def __rand__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(bitwise_and_in_place)
+    @in_place_single_command_operation(bitwise_and_in_place, operator="&")
     def __iand__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(bitwise_xor)
+    @single_command_operation(bitwise_xor, operator="^")
     def __xor__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(bitwise_xor, reverse=True)
+    @single_command_operation(bitwise_xor, reverse=True, operator="^")
     def __rxor__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(bitwise_xor_in_place)
+    @in_place_single_command_operation(bitwise_xor_in_place, operator="^")
     def __ixor__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(bitwise_or)
+    @single_command_operation(bitwise_or, operator="|")
     def __or__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(bitwise_or, reverse=True)
+    @single_command_operation(bitwise_or, reverse=True, operator="|")
     def __ror__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @in_place_single_command_operation(bitwise_or_in_place)
+    @in_place_single_command_operation(bitwise_or_in_place, operator="|")
     def __ior__(self, other: int | mnllib.Variable) -> None:
         pass
 
-    @single_command_operation(negate)
+    @single_command_operation(negate, operator="-")
     def __neg__(self) -> None:
         pass
 
-    @single_command_operation(bitwise_not)
+    @single_command_operation(bitwise_not, operator="~")
     def __invert__(self) -> None:
         pass
 
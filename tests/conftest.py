@@ -0,0 +1,7 @@
+import mnllib
+import pytest
+
+
+@pytest.fixture
+def expected() -> mnllib.Subroutine:
+    return mnllib.Subroutine([])
@@ -0,0 +1,27 @@
+import mnllib
+
+from mnlscript.commands import wait
+from mnlscript.misc import subroutine
+
+
+def test_commands_go_to_the_innermost_sub() -> None:
+    subroutines: list[mnllib.Subroutine] = []
+    header = mnllib.FEventScriptHeader()
+    others = [mnllib.Subroutine([]), mnllib.Subroutine([])]
+
+    def emit_wait() -> None:
+        wait(1)
+
+    def build_others() -> None:
+        for sub in others:
+            emit_wait()
+
+    @subroutine(subs=subroutines, hdr=header, no_return=True)
+    def sub_0(sub: mnllib.Subroutine) -> None:
+        emit_wait()
+        build_others()
+
+    assert [len(other.commands) for other in others] == [1, 1]
+    assert len(sub_0.commands) == 1
+    assert len(subroutines) == 1
+    assert subroutines[0] is sub_0
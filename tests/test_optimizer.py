@@ -0,0 +1,235 @@
+import typing
+
+import mnllib
+import pytest
+
+from mnlscript.commands import (
+    add,
+    add_in_place,
+    bitwise_or,
+    decrement,
+    emit_command,
+    increment,
+    multiply_in_place,
+    return_,
+    set_variable,
+    terminate_script,
+)
+from mnlscript.globals import Globals
+from mnlscript.tools.optimizer import deduplicate_subroutines, optimize_subroutine
+from mnlscript.variables import Variable
+
+from .utils import SyntheticMnLScriptManager, summarize_commands
+
+
+@pytest.fixture
+def manager() -> mnllib.MnLScriptManager:
+    parameter_type = min(
+        mnllib.COMMAND_PARAMETER_STRUCT_MAP,
+        key=lambda x: mnllib.COMMAND_PARAMETER_STRUCT_MAP[x].size,
+    )
+    return typing.cast(
+        mnllib.MnLScriptManager, SyntheticMnLScriptManager(parameter_type)
+    )
+
+
+@pytest.fixture
+def subroutine() -> mnllib.Subroutine:
+    return mnllib.Subroutine([])
+
+
+def test_constant_folding(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    add(2, 3, Variable(0x1000), subroutine=subroutine)
+    bitwise_or(0x10, 0x01, Variable(0x1001), subroutine=subroutine)
+    add(Variable(0x1000), 3, Variable(0x1002), subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 0
+    set_variable(5, Variable(0x1000), subroutine=expected)
+    set_variable(0x11, Variable(0x1001), subroutine=expected)
+    add(Variable(0x1000), 3, Variable(0x1002), subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_constant_folding_result_does_not_fit(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    parameter_struct = mnllib.COMMAND_PARAMETER_STRUCT_MAP[
+        manager.command_parameter_metadata_table[0x0008].parameter_types[0]
+    ]
+    value = 1 << (parameter_struct.size * 8 - 1)
+    add(value, value, Variable(0x1000), subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 0
+    add(value, value, Variable(0x1000), subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_set_merging(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    set_variable(5, Variable(0x1000), subroutine=subroutine)
+    add_in_place(3, Variable(0x1000), subroutine=subroutine)
+    increment(Variable(0x1000), subroutine=subroutine)
+    increment(Variable(0x1001), subroutine=subroutine)
+    increment(Variable(0x1001), subroutine=subroutine)
+    increment(Variable(0x1002), subroutine=subroutine)
+    decrement(Variable(0x1002), subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 5
+    set_variable(9, Variable(0x1000), subroutine=expected)
+    add_in_place(2, Variable(0x1001), subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_dead_store_removal(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    add(Variable(0x1001), Variable(0x1002), Variable(0x1000), subroutine=subroutine)
+    set_variable(Variable(0x1003), Variable(0x1000), subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 1
+    set_variable(Variable(0x1003), Variable(0x1000), subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_store_read_by_next_command(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    set_variable(Variable(0x1001), Variable(0x1000), subroutine=subroutine)
+    add(Variable(0x1000), Variable(0x1002), Variable(0x1000), subroutine=subroutine)
+    set_variable(Variable(0x1003), Variable(0x1004), subroutine=subroutine)
+    multiply_in_place(Variable(0x1002), Variable(0x1004), subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 0
+    set_variable(Variable(0x1001), Variable(0x1000), subroutine=expected)
+    add(Variable(0x1000), Variable(0x1002), Variable(0x1000), subroutine=expected)
+    set_variable(Variable(0x1003), Variable(0x1004), subroutine=expected)
+    multiply_in_place(Variable(0x1002), Variable(0x1004), subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+@pytest.mark.parametrize("terminating_command", [terminate_script, return_])
+def test_truncation_after_terminating_command(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+    terminating_command: typing.Callable[..., mnllib.Command],
+) -> None:
+    set_variable(1, Variable(0x1000), subroutine=subroutine)
+    terminating_command(subroutine=subroutine)
+    set_variable(2, Variable(0x1001), subroutine=subroutine)
+    terminating_command(subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 2
+    set_variable(1, Variable(0x1000), subroutine=expected)
+    terminating_command(subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_branching_subroutine_is_unchanged(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    for output in [subroutine, expected]:
+        add(2, 3, Variable(0x1000), subroutine=output)
+        set_variable(1, Variable(0x1000), subroutine=output)
+        emit_command(0x0002, [0x00000000], subroutine=output)
+        return_(subroutine=output)
+        set_variable(2, Variable(0x1000), subroutine=output)
+
+    assert optimize_subroutine(manager, subroutine) == 0
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_unknown_commands_split_runs(
+    manager: mnllib.MnLScriptManager,
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+) -> None:
+    set_variable(1, Variable(0x1000), subroutine=subroutine)
+    increment(Variable(0x1000), subroutine=subroutine)
+    emit_command(0x0050, [Variable(0x1000)], subroutine=subroutine)
+    set_variable(2, Variable(0x1000), subroutine=subroutine)
+    increment(Variable(0x1000), subroutine=subroutine)
+    set_variable(3, Variable(0x1000), subroutine=subroutine)
+
+    assert optimize_subroutine(manager, subroutine) == 3
+    set_variable(2, Variable(0x1000), subroutine=expected)
+    emit_command(0x0050, [Variable(0x1000)], subroutine=expected)
+    set_variable(3, Variable(0x1000), subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+SUBROUTINE_CALL_COMMAND_ID = 0x0050
+
+
+def build_duplicate_subroutines_script() -> mnllib.FEventScript:
+    subroutines = [mnllib.Subroutine([]) for _ in range(4)]
+    for index in [1, 2, 3]:
+        emit_command(SUBROUTINE_CALL_COMMAND_ID, [index], subroutine=subroutines[0])
+    set_variable(1, Variable(0x1000), subroutine=subroutines[1])
+    set_variable(1, Variable(0x1000), subroutine=subroutines[2])
+    set_variable(2, Variable(0x1000), subroutine=subroutines[3])
+    for output in subroutines:
+        return_(subroutine=output)
+    return mnllib.FEventScript(mnllib.FEventScriptHeader(array1=[2, 3]), subroutines, 0)
+
+
+def map_header_subroutine_indices(
+    header: mnllib.FEventScriptHeader, function: typing.Callable[[int], int]
+) -> None:
+    header.array1 = [function(index) for index in header.array1]
+
+
+def called_subroutine_indices(script: mnllib.FEventScript) -> list[int]:
+    return [command.arguments[0] for command in script.subroutines[0].commands[:-1]]
+
+
+@pytest.fixture
+def _subroutine_call_commands(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        Globals, "subroutine_call_commands", {SUBROUTINE_CALL_COMMAND_ID: 0}
+    )
+
+
+@pytest.mark.usefixtures("_subroutine_call_commands")
+def test_deduplicated_subroutines_are_dropped(
+    manager: mnllib.MnLScriptManager, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        Globals, "map_header_subroutine_indices", map_header_subroutine_indices
+    )
+    script = build_duplicate_subroutines_script()
+    original_size = len(script.to_bytes(manager))
+
+    saved_bytes = deduplicate_subroutines(manager, script)
+    assert saved_bytes > 0
+    assert len(script.to_bytes(manager)) == original_size - saved_bytes
+    assert len(script.subroutines) == 3
+    assert called_subroutine_indices(script) == [1, 1, 2]
+    assert script.header.array1 == [1, 2]
+
+
+@pytest.mark.usefixtures("_subroutine_call_commands")
+def test_deduplicated_subroutines_are_kept_without_header_mapping(
+    manager: mnllib.MnLScriptManager,
+) -> None:
+    script = build_duplicate_subroutines_script()
+
+    assert deduplicate_subroutines(manager, script) == 0
+    assert len(script.subroutines) == 4
+    assert called_subroutine_indices(script) == [1, 1, 3]
+    assert script.header.array1 == [2, 3]
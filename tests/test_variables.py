@@ -0,0 +1,142 @@
+import typing
+
+import mnllib
+import pytest
+
+from mnlscript.commands import (
+    add,
+    add_in_place,
+    multiply,
+    multiply_in_place,
+    negate,
+    subtract,
+    subtract_in_place,
+)
+from mnlscript.globals import Globals
+from mnlscript.variables import Variable, Variables
+
+from .utils import summarize_commands
+
+
+@pytest.fixture
+def subroutine() -> typing.Iterator[mnllib.Subroutine]:
+    subroutine = mnllib.Subroutine([])
+    token = Globals.current_subroutine.set(subroutine)
+    yield subroutine
+    Globals.current_subroutine.reset(token)
+
+
+def set_scratch_variables(monkeypatch: pytest.MonkeyPatch, *numbers: int) -> None:
+    monkeypatch.setattr(Globals, "scratch_variables", list(numbers))
+
+
+def test_nested_expression(
+    subroutine: mnllib.Subroutine, expected: mnllib.Subroutine
+) -> None:
+    Variables[0x1] = (Variables[0x2] + 3) * Variables[0x4]
+
+    add(Variables[0x2], 3, Variables[0x1], subroutine=expected)
+    multiply_in_place(Variables[0x4], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_nested_right_operand(
+    subroutine: mnllib.Subroutine, expected: mnllib.Subroutine
+) -> None:
+    Variables[0x1] = 10 - (Variables[0x2] + 1)
+
+    add(Variables[0x2], 1, Variables[0x1], subroutine=expected)
+    subtract(10, Variables[0x1], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_nested_unary_expression(
+    subroutine: mnllib.Subroutine, expected: mnllib.Subroutine
+) -> None:
+    Variables[0x1] = -(Variables[0x2] + 1)
+
+    add(Variables[0x2], 1, Variables[0x1], subroutine=expected)
+    negate(Variables[0x1], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_in_place_expression_uses_scratch_variable(
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_scratch_variables(monkeypatch, 0x1000)
+    variable = Variable(0x1)
+    variable += Variables[0x2] * Variables[0x3]
+
+    multiply(Variables[0x2], Variables[0x3], Variables[0x1000], subroutine=expected)
+    add_in_place(Variables[0x1000], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_scratch_variables_skip_operands(
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_scratch_variables(monkeypatch, 0x1000, 0x1001)
+    variable = Variable(0x1)
+    variable += Variables[0x1000] * Variables[0x3]
+
+    multiply(Variables[0x1000], Variables[0x3], Variables[0x1001], subroutine=expected)
+    add_in_place(Variables[0x1001], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_scratch_variables_are_released(
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_scratch_variables(monkeypatch, 0x1000)
+    Variables[0x1] = (
+        Variables[0x2] * Variables[0x3]
+        + Variables[0x4] * Variables[0x5]
+        + Variables[0x6] * Variables[0x7]
+    )
+
+    multiply(Variables[0x2], Variables[0x3], Variables[0x1], subroutine=expected)
+    multiply(Variables[0x4], Variables[0x5], Variables[0x1000], subroutine=expected)
+    add_in_place(Variables[0x1000], Variables[0x1], subroutine=expected)
+    multiply(Variables[0x6], Variables[0x7], Variables[0x1000], subroutine=expected)
+    add_in_place(Variables[0x1000], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_nested_scratch_variables(
+    subroutine: mnllib.Subroutine,
+    expected: mnllib.Subroutine,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_scratch_variables(monkeypatch, 0x1000, 0x1001)
+    variable = Variable(0x1)
+    variable += Variables[0x2] * Variables[0x3] - Variables[0x4] * Variables[0x5]
+
+    multiply(Variables[0x2], Variables[0x3], Variables[0x1000], subroutine=expected)
+    multiply(Variables[0x4], Variables[0x5], Variables[0x1001], subroutine=expected)
+    subtract_in_place(Variables[0x1001], Variables[0x1000], subroutine=expected)
+    add_in_place(Variables[0x1000], Variables[0x1], subroutine=expected)
+    assert summarize_commands(subroutine) == summarize_commands(expected)
+
+
+def test_empty_scratch_pool(subroutine: mnllib.Subroutine) -> None:
+    with pytest.raises(ValueError, match="no scratch variables are available"):
+        Variables[0x1] = (Variables[0x2] + 1) - Variables[0x1]
+
+    assert summarize_commands(subroutine) == []
+
+
+def test_exhausted_scratch_pool(
+    subroutine: mnllib.Subroutine, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    set_scratch_variables(monkeypatch, 0x1000)
+    variable = Variable(0x1)
+    with pytest.raises(ValueError, match="no scratch variables are available"):
+        variable += Variables[0x2] * Variables[0x3] - Variables[0x4] * Variables[0x5]
+
+    assert summarize_commands(subroutine) == []
@@ -0,0 +1,44 @@
+import typing
+
+import mnllib
+
+
+CommandSummary: typing.TypeAlias = tuple[int, list[int | tuple[int]], int | None]
+
+
+def summarize_commands(subroutine: mnllib.Subroutine) -> list[CommandSummary]:
+    return [
+        (
+            command.command_id,
+            [
+                (
+                    (argument.number,)
+                    if isinstance(argument, mnllib.Variable)
+                    else argument
+                )
+                for argument in command.arguments
+            ],
+            (
+                command.result_variable.number
+                if command.result_variable is not None
+                else None
+            ),
+        )
+        for command in subroutine.commands
+    ]
+
+
+class SyntheticCommandParameterMetadata:
+    parameter_types: list[typing.Any]
+
+    def __init__(self, parameter_types: list[typing.Any]) -> None:
+        self.parameter_types = parameter_types
+
+
+class SyntheticMnLScriptManager:
+    command_parameter_metadata_table: list[SyntheticCommandParameterMetadata]
+
+    def __init__(self, parameter_type: typing.Any) -> None:
+        self.command_parameter_metadata_table = [
+            SyntheticCommandParameterMetadata([parameter_type] * 16)
+        ] * 0x10000